@@ -0,0 +1,14 @@
+"""Channel layers instrumented for the benchmarks."""
+
+from channels.layers import InMemoryChannelLayer
+
+
+class CountingChannelLayer(InMemoryChannelLayer):
+    """In-memory channel layer counting the messages put on channels,
+    including every per-channel copy of a group message."""
+
+    sends = 0
+
+    async def send(self, channel, message):
+        self.sends += 1
+        await super().send(channel, message)
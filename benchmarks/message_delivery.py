@@ -0,0 +1,91 @@
+"""Measures end-to-end delivery latency of a chat message.
+
+The message is sent with ``Message.send_message`` and counted as delivered
+when the recipient's socket holds the rendered message: either straight from
+the channel payload, or after the extra ``receive_message`` AJAX call the
+client needs when only the message id is pushed.
+
+Usage:
+    python -m benchmarks.message_delivery --messages 500
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import setup_django, test_database
+
+
+async def deliver(messages, rendered):
+    from asgiref.sync import sync_to_async
+    from asgiref.testing import ApplicationCommunicator
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    from src.messenger.consumers import MessengerConsumer
+    from src.messenger.models import Message
+
+    user_model = get_user_model()
+    sender = await sync_to_async(user_model.objects.create_user)("bench_sender", password="password")
+    recipient = await sync_to_async(user_model.objects.create_user)("bench_recipient", password="password")
+    client = Client()
+    await sync_to_async(client.force_login)(recipient)
+
+    communicator = ApplicationCommunicator(
+        MessengerConsumer.as_asgi(),
+        {"type": "websocket", "path": "/bench_sender/", "query_string": b"", "headers": [],
+         "subprotocols": [], "user": recipient, "url_route": {"kwargs": {"username": "bench_sender"}}},
+    )
+    await communicator.send_input({"type": "websocket.connect"})
+    await communicator.receive_output()
+
+    latencies = []
+
+    with override_settings(MESSENGER_RENDERED_PAYLOADS=rendered):
+        for i in range(messages):
+            start = time.perf_counter()
+            message = await sync_to_async(Message.send_message)(sender, recipient, f"Message {i}")
+            await communicator.receive_output()
+
+            if not rendered:
+                await sync_to_async(client.get)(
+                    reverse("messenger:receive_message"),
+                    {"message_id": message.uuid_id},
+                    HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                )
+
+            latencies.append(time.perf_counter() - start)
+
+    await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+    await communicator.wait()
+    await sync_to_async(user_model.objects.filter(pk__in=[sender.pk, recipient.pk]).delete)()
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from asgiref.sync import async_to_sync
+    from django.test.utils import override_settings
+
+    in_memory = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+    with test_database(), override_settings(CHANNEL_LAYERS=in_memory):
+        for label, rendered in (("id + receive_message", False), ("rendered payload", True)):
+            latencies = sorted(async_to_sync(deliver)(args.messages, rendered))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{label:<22} median {statistics.median(latencies) * 1000:7.3f} ms"
+                f"  p95 {p95 * 1000:7.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
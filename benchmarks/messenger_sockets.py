@@ -0,0 +1,132 @@
+"""Load test for sending chat messages with many concurrent clients.
+
+Every client holds a messenger socket on the in-memory channel layer and
+sends messages to the next client, either as ``message.send`` frames over the
+socket (waiting for the ack) or as AJAX POSTs to the ``send_message`` view.
+Reports the throughput and the per-message latency of both paths.
+
+Usage:
+    python -m benchmarks.messenger_sockets --clients 50 --messages 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from benchmarks.utils import make_users, setup_django, test_database
+
+
+async def connect(user):
+    from asgiref.testing import ApplicationCommunicator
+
+    from src.messenger.consumers import MessengerConsumer
+
+    communicator = ApplicationCommunicator(
+        MessengerConsumer.as_asgi(),
+        {"type": "websocket", "path": "/", "query_string": b"", "headers": [],
+         "subprotocols": [], "user": user},
+    )
+    await communicator.send_input({"type": "websocket.connect"})
+    await communicator.receive_output()
+    return communicator
+
+
+async def receive_ack(communicator):
+    """Waits for the next ack, skipping the messages received meanwhile."""
+    while True:
+        frame = json.loads((await communicator.receive_output(timeout=30))["text"])
+
+        if frame.get("key") == "message.ack":
+            return frame
+
+
+async def send_over_socket(communicator, recipient, messages, latencies):
+    for i in range(messages):
+        start = time.perf_counter()
+        await communicator.send_input({
+            "type": "websocket.receive",
+            "text": json.dumps({
+                "type": "message.send", "to": recipient.username,
+                "message": f"Message {i}", "client_id": str(i),
+            }),
+        })
+        await receive_ack(communicator)
+        latencies.append(time.perf_counter() - start)
+
+
+async def send_over_http(client, recipient, messages, latencies):
+    from asgiref.sync import sync_to_async
+    from django.urls import reverse
+
+    for i in range(messages):
+        start = time.perf_counter()
+        await sync_to_async(client.post)(
+            reverse("messenger:send_message"),
+            {"to": recipient.username, "message": f"Message {i}"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(users, messages, over_socket):
+    from asgiref.sync import sync_to_async
+    from django.test import Client
+
+    communicators = [await connect(user) for user in users]
+    latencies = []
+    senders = []
+
+    for index, user in enumerate(users):
+        recipient = users[(index + 1) % len(users)]
+
+        if over_socket:
+            senders.append(send_over_socket(communicators[index], recipient, messages, latencies))
+        else:
+            client = Client()
+            await sync_to_async(client.force_login)(user)
+            senders.append(send_over_http(client, recipient, messages, latencies))
+
+    start = time.perf_counter()
+    await asyncio.gather(*senders)
+    elapsed = time.perf_counter() - start
+
+    for communicator in communicators:
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait()
+
+    return elapsed, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from asgiref.sync import async_to_sync
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+
+    in_memory = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+    with test_database(), override_settings(CHANNEL_LAYERS=in_memory):
+        make_users(args.clients)
+        users = list(get_user_model().objects.order_by("pk"))
+        total = args.clients * args.messages
+
+        for label, over_socket in (("AJAX send_message", False), ("socket frame", True)):
+            elapsed, latencies = async_to_sync(run)(users, args.messages, over_socket)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{label:<18} {total / elapsed:8.1f} msg/s"
+                f"  median {statistics.median(latencies) * 1000:7.3f} ms"
+                f"  p95 {p95 * 1000:7.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measures rows/second of a global notification fan-out.
+
+Compares the old one-INSERT-per-user loop with the batched ``bulk_notify``
+path used by ``notification_handler``.
+
+Usage:
+    python -m benchmarks.notification_fanout --users 10000 100000 --batch-size 500
+"""
+
+import argparse
+
+from benchmarks.utils import make_users, setup_django, test_database, timer
+
+
+def run(user_counts, batch_size, skip_legacy):
+    from django.contrib.auth import get_user_model
+
+    from src.notifications.models import Notification
+
+    user_model = get_user_model()
+
+    for count in user_counts:
+        user_model.objects.all().delete()
+        make_users(count)
+        actor = user_model.objects.create(username="bench_actor")
+        recipients = user_model.objects.exclude(pk=actor.pk).only("id", "username")
+
+        results = {}
+
+        if not skip_legacy:
+            with timer(results, "per-row create"):
+                for user in recipients:
+                    Notification.objects.create(actor=actor, recipient=user, verb=Notification.LOGGED_IN)
+
+            Notification.objects.all().delete()
+
+        with timer(results, f"bulk_notify (batch={batch_size})"):
+            Notification.objects.bulk_notify(
+                actor,
+                recipients.iterator(chunk_size=batch_size),
+                Notification.LOGGED_IN,
+                batch_size=batch_size,
+            )
+
+        Notification.objects.all().delete()
+
+        for label, seconds in results.items():
+            print(f"{count:>7} users  {label:<28} {seconds:8.2f}s  {count / seconds:>10.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the batched path.")
+    args = parser.parse_args()
+
+    setup_django()
+
+    with test_database():
+        run(args.users, args.batch_size, args.skip_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Counts channel-layer sends needed to deliver one targeted notification.
+
+Simulates ``--users`` connected users with ``--sockets`` sockets each on an
+in-memory channel layer and compares the old single global group with the
+per-user groups used by ``NotificationsConsumer``.
+
+Usage:
+    python -m benchmarks.notification_groups --users 1000 10000 --sockets 2 --events 100
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.utils import setup_django
+
+
+def counting_layer():
+    from benchmarks.layers import CountingChannelLayer
+
+    return CountingChannelLayer(capacity=1_000_000)
+
+
+async def deliver(users, sockets, events, per_user_groups):
+    from src.notifications.consumers import GLOBAL_GROUP, user_group
+
+    layer = counting_layer()
+
+    for user_id in range(users):
+        for _ in range(sockets):
+            channel = await layer.new_channel()
+            group = user_group(user_id) if per_user_groups else GLOBAL_GROUP
+            await layer.group_add(group, channel)
+
+    start = time.perf_counter()
+
+    for event in range(events):
+        recipient_id = event % users
+        group = user_group(recipient_id) if per_user_groups else GLOBAL_GROUP
+        await layer.group_send(group, {"type": "receive", "recipient_id": recipient_id})
+
+    return layer.sends, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--sockets", type=int, default=2, help="Sockets per user.")
+    parser.add_argument("--events", type=int, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+
+    for users in args.users:
+        for label, per_user_groups in (("global group", False), ("per-user groups", True)):
+            sends, seconds = asyncio.run(deliver(users, args.sockets, args.events, per_user_groups))
+            print(
+                f"{users:>7} users  {label:<16} {sends / args.events:>10.1f} sends/event"
+                f"  {seconds / args.events * 1000:8.3f} ms/event"
+            )
+
+
+if __name__ == "__main__":
+    main()
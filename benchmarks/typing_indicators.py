@@ -0,0 +1,110 @@
+"""Measures the cost of typing indicators with many concurrent typers.
+
+Every user holds a messenger socket and sends ``--keystrokes`` typing frames
+to the next user as fast as possible, all users at once. The run is repeated
+without throttling and with ``MESSENGER_TYPING_THROTTLE``, reporting the
+per-frame overhead, the channel-layer messages and the database queries.
+
+Usage:
+    python -m benchmarks.typing_indicators --typers 200 --keystrokes 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.utils import make_users, setup_django, test_database
+
+
+async def connect(user):
+    from asgiref.testing import ApplicationCommunicator
+
+    from src.messenger.consumers import MessengerConsumer
+
+    communicator = ApplicationCommunicator(
+        MessengerConsumer.as_asgi(),
+        {"type": "websocket", "path": "/", "query_string": b"", "headers": [],
+         "subprotocols": [], "user": user},
+    )
+    await communicator.send_input({"type": "websocket.connect"})
+    await communicator.receive_output()
+    return communicator
+
+
+async def send_frame(communicator, **frame):
+    await communicator.send_input({"type": "websocket.receive", "text": json.dumps(frame)})
+
+
+async def type_to(communicator, recipient, keystrokes):
+    for _ in range(keystrokes):
+        await send_frame(communicator, type="typing", to=recipient.username)
+
+    # Frames are handled in order, so the answer to an empty presence watch
+    # means every typing frame before it has been processed.
+    await send_frame(communicator, type="presence.watch", users=[])
+
+    while True:
+        frame = json.loads((await communicator.receive_output(timeout=60))["text"])
+
+        if frame["key"] == "presence":
+            return
+
+
+async def run(users, keystrokes):
+    from channels.layers import get_channel_layer
+
+    communicators = [await connect(user) for user in users]
+    layer = get_channel_layer()
+    layer.sends = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        type_to(communicator, users[(index + 1) % len(users)], keystrokes)
+        for index, communicator in enumerate(communicators)
+    ))
+    elapsed = time.perf_counter() - start
+    sends = layer.sends
+
+    for communicator in communicators:
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait()
+
+    return elapsed, sends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--typers", type=int, default=200)
+    parser.add_argument("--keystrokes", type=int, default=50, help="Typing frames per typer.")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from asgiref.sync import async_to_sync
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+
+    counting = {"default": {"BACKEND": "benchmarks.layers.CountingChannelLayer",
+                            "CONFIG": {"capacity": 1_000_000}}}
+
+    with test_database(), override_settings(CHANNEL_LAYERS=counting):
+        make_users(args.typers)
+        users = list(get_user_model().objects.order_by("pk"))
+        frames = args.typers * args.keystrokes
+
+        for label, throttle in (("unthrottled", 0), ("throttled", settings.MESSENGER_TYPING_THROTTLE)):
+            with override_settings(MESSENGER_TYPING_THROTTLE=throttle), \
+                    CaptureQueriesContext(connection) as queries:
+                elapsed, sends = async_to_sync(run)(users, args.keystrokes)
+
+            print(
+                f"{label:<12} {elapsed / frames * 1_000_000:8.1f} us/frame"
+                f"  {sends:7d} layer messages  {len(queries.captured_queries):5d} queries"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway test database created from the configured
+``DATABASES`` settings, so they never touch real data.
+"""
+
+import contextlib
+import os
+import time
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    """Creates a fresh test database for the duration of the block."""
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextlib.contextmanager
+def timer(results, label):
+    """Stores the wall-clock seconds spent in the block under ``label``."""
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        results[label] = time.perf_counter() - start
+
+
+def make_users(count, prefix="bench_user"):
+    """Creates ``count`` users with a single bulk INSERT per batch."""
+
+    from django.contrib.auth import get_user_model
+
+    user_model = get_user_model()
+
+    return user_model.objects.bulk_create(
+        (user_model(username=f"{prefix}_{i}") for i in range(count)),
+        batch_size=1000,
+    )
@@ -0,0 +1,76 @@
+"""Compares insert throughput with random and time-ordered primary keys.
+
+Fills the message table with ``--rows`` rows keyed by either ``uuid.uuid4``
+or ``uuid7``, then times inserting ``--inserts`` more in batches. Each key
+kind gets a fresh test database. On PostgreSQL the size of the primary key
+index is reported too, as page splits leave random keys with a larger one.
+
+Usage:
+    python -m benchmarks.uuid_inserts --rows 1000000 --inserts 100000
+"""
+
+import argparse
+import uuid
+
+from benchmarks.utils import make_users, setup_django, test_database, timer
+
+
+def insert(sender, recipient, count, make_key, batch_size):
+    from src.messenger.models import Message
+
+    for start in range(0, count, batch_size):
+        Message.objects.bulk_create(
+            Message(uuid_id=make_key(), sender=sender, recipient=recipient, message="Benchmark")
+            for _ in range(min(batch_size, count - start))
+        )
+
+
+def index_size(connection):
+    from src.messenger.models import Message
+
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_relation_size(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND indisprimary",
+            [Message._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the table before timing.")
+    parser.add_argument("--inserts", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+
+    from src.identifiers import uuid7
+
+    for label, make_key in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+        with test_database() as connection:
+            make_users(2, prefix=label)
+            sender, recipient = get_user_model().objects.filter(username__startswith=label)
+            insert(sender, recipient, args.rows, make_key, args.batch_size)
+
+            results = {}
+
+            with timer(results, label):
+                insert(sender, recipient, args.inserts, make_key, args.batch_size)
+
+            size = index_size(connection)
+            line = f"{label}  {args.inserts / results[label]:10.0f} rows/s"
+
+            if size is not None:
+                line += f"  primary key index {size / 1024 / 1024:8.1f} MiB"
+
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'src.messenger.apps.MessengerConfig',
     'src.notifications.apps.NotificationsConfig',
     'src.news.apps.NewsConfig',
+    'src.tasks.apps.TasksConfig',
 
     # libraries
     "channels",
@@ -162,6 +163,16 @@ cloudinary.config(
 SITE_ID = 1
 
 REDIS_URL = f'{os.getenv("REDIS_URL", default="redis://127.0.0.1:6379")}/{0}'
+REDIS_CACHE_URL = f'{os.getenv("REDIS_URL", default="redis://127.0.0.1:6379")}/{1}'
+
+# Counters, presence and other state written by the web, ASGI and worker
+# processes must be visible to all of them, so the cache lives in Redis.
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_CACHE_URL,
+    }
+}
 
 CHANNEL_LAYERS = {
     "default": {
@@ -171,3 +182,79 @@ CHANNEL_LAYERS = {
         },
     }
 }
+
+# Number of rows written per INSERT when a notification is fanned out
+# to many recipients.
+NOTIFICATIONS_BATCH_SIZE = int(os.getenv("NOTIFICATIONS_BATCH_SIZE", 500))
+# Seconds an unread notification counter lives in the cache before being
+# recounted from the database.
+NOTIFICATIONS_UNREAD_COUNT_TIMEOUT = 60 * 60
+# Unread notifications with the same recipient, verb and action object are
+# merged into one row ("alice and 12 others liked ...") when they happen
+# less than NOTIFICATIONS_COALESCE_WINDOW seconds apart.
+NOTIFICATIONS_COALESCE_VERBS = ("L", "C", "F", "A", "K", "V", "S", "R")
+NOTIFICATIONS_COALESCE_WINDOW = 60 * 60
+NOTIFICATIONS_SAMPLE_ACTORS = 3
+NOTIFICATIONS_PAGE_SIZE = 20
+# Include the serialized notification in WebSocket events so clients do not
+# need to call back latest-notifications.
+NOTIFICATIONS_RENDERED_PAYLOADS = True
+# Seconds notifications are kept by `python manage.py prune_notifications`:
+# per verb, and for every notification once it has been read.
+NOTIFICATIONS_RETENTION = {
+    "I": 60 * 60 * 24,  # logged in
+    "O": 60 * 60 * 24,  # logged out
+}
+NOTIFICATIONS_READ_RETENTION = 60 * 60 * 24 * 90
+
+# Deferred work queue, see src/tasks. The database backend needs
+# `python manage.py run_worker` running next to the web processes.
+TASKS_BACKEND = os.getenv("TASKS_BACKEND", "src.tasks.backends.DatabaseBackend")
+TASKS_BATCH_SIZE = 100
+TASKS_POLL_INTERVAL = 1.0
+# Seconds before the first retry of a failed task, doubled on each attempt.
+TASKS_RETRY_DELAY = 5
+# Seconds after which a task left running by a dead worker is picked up again.
+TASKS_LOCK_TIMEOUT = 300
+
+# Include the rendered message in WebSocket events so recipients do not need
+# to call back the receive_message view.
+MESSENGER_RENDERED_PAYLOADS = True
+# Messages loaded per scroll-back page of a conversation.
+MESSENGER_PAGE_SIZE = 50
+MESSENGER_INBOX_PAGE_SIZE = 20
+MESSENGER_CONTACTS_LIMIT = 10
+# Seconds during which read reports of a conversation are coalesced into a
+# single watermark update and receipt.
+MESSENGER_READ_RECEIPT_INTERVAL = 5
+# Seconds between two typing events of a user to the same recipient, and
+# seconds a typing indicator stays visible without a new event.
+MESSENGER_TYPING_THROTTLE = 3
+MESSENGER_TYPING_TTL = 6
+# Recipients of typing events a socket remembers without a new lookup.
+MESSENGER_TYPING_TARGETS = 50
+
+# Most messages and notifications replayed to a socket reconnecting with a
+# ``since`` cursor; clients further behind are told to reload instead.
+MESSENGER_REPLAY_LIMIT = 200
+NOTIFICATIONS_REPLAY_LIMIT = 100
+
+# Seconds a WebSocket connection counts as online without a heartbeat frame,
+# clients should send {"type": "heartbeat"} about three times as often.
+PRESENCE_TIMEOUT = 90
+PRESENCE_WATCH_LIMIT = 100
+PRESENCE_LIST_LIMIT = 100
+
+# Number of newest top-level news ids kept in the cached feed timeline,
+# deeper feed pages are read from the database, and seconds before the
+# cached timeline is reloaded from the database.
+NEWS_TIMELINE_SIZE = 1000
+NEWS_TIMELINE_TIMEOUT = 5 * 60
+NEWS_PAGE_SIZE = 15
+
+# Most news whose counts can be refreshed with a single interactions request.
+NEWS_INTERACTIONS_LIMIT = 100
+
+# Seconds during which new posts are counted into a single "additional_news"
+# event instead of one event per post.
+NEWS_ANNOUNCE_INTERVAL = 10
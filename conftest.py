@@ -0,0 +1,16 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def in_process_tasks(settings):
+    """Run deferred tasks synchronously so tests see their effects."""
+    settings.TASKS_BACKEND = "src.tasks.backends.InProcessBackend"
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached counters must not leak between tests sharing primary keys."""
+    cache.clear()
+    yield
+    cache.clear()
@@ -1,9 +1,14 @@
 from django.contrib import admin
 
-from src.messenger.models import Message
+from src.messenger.models import Conversation, Message
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ("sender", "recipient", "timestamp")
     list_filter = ("sender", "recipient")
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ("user_one", "user_two", "last_message_at", "unread_one", "unread_two")
@@ -1,10 +1,41 @@
 import json
+import time
+from collections import OrderedDict
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 
+from src.messenger import receipts
+from src.messenger.models import Message
+from src.notifications.consumers import parse_frame, replay
+from src.pagination import resolve_cursor
+from src.users.presence import PresenceConsumerMixin
 
-class MessengerConsumer(AsyncWebsocketConsumer):
-    """Consumer to manage WebSocket connections for the Messenger app."""
+
+def user_group(user_id):
+    """Channel group holding every messenger socket of a single user."""
+    return f"messenger-{user_id}"
+
+
+class MessengerConsumer(PresenceConsumerMixin, AsyncWebsocketConsumer):
+    """Consumer to manage WebSocket connections for the Messenger app.
+
+    Sockets reconnecting with ``?since=<cursor>``, the cursor of the last
+    message received, first receive the messages they missed. Besides
+    receiving the messages sent to the user, the socket accepts typed JSON
+    frames from the client:
+
+    * ``{"type": "message.send", "to": ..., "message": ..., "client_id": ...}``
+      stores the message and answers with a ``message.ack`` carrying its id.
+    * ``{"type": "message.read", "from": ..., "cursor": ...}`` marks the
+      messages of that user up to the message of the cursor, or all of them,
+      as read. The sender gets a coalesced ``message.read`` receipt.
+    * ``{"type": "typing", "to": ..., "active": ...}`` tells the other user's
+      sockets whether the user is typing, without touching the database.
+    """
 
     async def connect(self):
         """Consumer Connect implementation, to validate user status and prevent
@@ -13,21 +44,201 @@ class MessengerConsumer(AsyncWebsocketConsumer):
         if self.scope["user"].is_anonymous:
             await self.close()
         else:
+            self.typing_sent = {}
+            self.typing_targets = OrderedDict()
             await self.channel_layer.group_add(
-                f"{self.scope['user'].username}",
+                user_group(self.scope["user"].pk),
                 self.channel_name,
             )
             await self.accept()
+            await replay(self, self.get_missed)
+            await self.presence_connect()
 
     async def disconnect(self, close_code):
         """Consumer implementation to leave behind the group at the moment the
         closes the connection."""
-        await self.channel_layer.group_discard(
-            f"{self.scope['user'].username}",
-            self.channel_name,
-        )
+        if not self.scope["user"].is_anonymous:
+            await self.channel_layer.group_discard(
+                user_group(self.scope["user"].pk),
+                self.channel_name,
+            )
+        await self.presence_disconnect()
 
     async def receive(self, text_data):
-        """Receive method implementation to redirect any new message received
-        on the websocket to broadcast to all the clients."""
+        """Dispatches the frames sent by the client and forwards the events
+        sent to the user's group to the client."""
+        if isinstance(text_data, str):
+            frame = parse_frame(text_data)
+
+            if frame is not None:
+                handler = self.frame_handlers.get(frame.get("type"))
+
+                if handler is not None:
+                    await handler(self, frame)
+                    return
+
+                if await self.receive_presence_frame(frame):
+                    return
+
         await self.send(text_data=json.dumps(text_data))
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    async def receive_send(self, frame):
+        message = frame.get("message")
+        client_id = frame.get("client_id")
+
+        if not isinstance(message, str) or not message.strip():
+            await self.send_json({"key": "error", "client_id": client_id, "error": "empty message"})
+            return
+
+        message = await self.create_message(str(frame.get("to", "")), message)
+
+        if message is None:
+            await self.send_json({"key": "error", "client_id": client_id, "error": "unknown recipient"})
+            return
+
+        await self.send_json({
+            "key": "message.ack",
+            "client_id": client_id,
+            "message_id": str(message.uuid_id),
+            "timestamp": message.timestamp.isoformat(),
+        })
+
+    async def receive_read(self, frame):
+        message_id = None
+
+        if frame.get("cursor"):
+            try:
+                message_id = resolve_cursor(Message, frame["cursor"])[1]
+            except ValueError:
+                await self.send_json({"key": "error", "error": "invalid cursor"})
+                return
+
+        if not await self.mark_as_read(str(frame.get("from", "")), message_id):
+            await self.send_json({"key": "error", "error": "invalid cursor"})
+
+    async def receive_typing(self, frame):
+        """Relays typing state to the other user's sockets through the channel
+        layer only. While the user keeps typing at most one event per
+        ``MESSENGER_TYPING_THROTTLE`` seconds is sent to each recipient, and
+        clients drop the indicator after ``MESSENGER_TYPING_TTL`` seconds
+        without a new event. ``"active": false`` clears it right away."""
+
+        recipient_id = await self.get_typing_target(str(frame.get("to", "")))
+
+        if recipient_id is None:
+            return
+
+        active = frame.get("active", True) is not False
+        now = time.time()
+
+        if active:
+            if now - self.typing_sent.get(recipient_id, 0) < settings.MESSENGER_TYPING_THROTTLE:
+                return
+
+            self.typing_sent[recipient_id] = now
+        else:
+            self.typing_sent.pop(recipient_id, None)
+
+        await self.channel_layer.group_send(
+            user_group(recipient_id),
+            {
+                "type": "typing",
+                "sender": self.scope["user"].username,
+                "active": active,
+                "sent_at": now,
+            },
+        )
+
+    frame_handlers = {
+        "message.send": receive_send,
+        "message.read": receive_read,
+        "typing": receive_typing,
+    }
+
+    async def typing(self, event):
+        # Events that waited in the channel layer past their lifetime are
+        # stale and no longer worth showing.
+        expires_in = settings.MESSENGER_TYPING_TTL - (time.time() - event["sent_at"])
+
+        if expires_in <= 0:
+            return
+
+        await self.send_json({
+            "key": "typing",
+            "sender": event["sender"],
+            "active": event["active"],
+            "expires_in": round(expires_in, 1) if event["active"] else 0,
+        })
+
+    async def get_typing_target(self, username):
+        """The pk of the user named ``username``. The last
+        ``MESSENGER_TYPING_TARGETS`` lookups of the connection are kept, so
+        typing frames do not query the database."""
+        if username in self.typing_targets:
+            self.typing_targets.move_to_end(username)
+            return self.typing_targets[username]
+
+        recipient_id = await self.get_recipient_id(username)
+        self.typing_targets[username] = recipient_id
+
+        if len(self.typing_targets) > settings.MESSENGER_TYPING_TARGETS:
+            _, evicted = self.typing_targets.popitem(last=False)
+            self.typing_sent.pop(evicted, None)
+
+        return recipient_id
+
+    def get_recipient(self, username):
+        """The active user named ``username`` other than the connected one."""
+        return (
+            get_user_model()
+            .objects.filter(username=username, is_active=True)
+            .exclude(pk=self.scope["user"].pk)
+            .first()
+        )
+
+    def get_missed(self, since):
+        messages, truncated = Message.objects.get_missed(self.scope["user"], since)
+        return [message.get_payload() for message in messages], truncated
+
+    @database_sync_to_async
+    def get_recipient_id(self, username):
+        recipient = self.get_recipient(username)
+        return recipient.pk if recipient else None
+
+    @database_sync_to_async
+    def create_message(self, username, message):
+        recipient = self.get_recipient(username)
+
+        if recipient is None:
+            return None
+
+        return Message.send_message(self.scope["user"], recipient, message)
+
+    @database_sync_to_async
+    def mark_as_read(self, username, message_id=None):
+        """Marks the messages of the user named ``username`` as read up to
+        the message ``message_id``, or all of them. The watermark is the
+        timestamp stored with that message, never one sent by the client.
+        Returns False when it is not a message of that user to this one."""
+        sender = self.get_recipient(username)
+
+        if sender is None:
+            return message_id is None
+
+        up_to = timezone.now()
+
+        if message_id is not None:
+            up_to = (
+                Message.objects.filter(pk=message_id, sender=sender, recipient=self.scope["user"])
+                .values_list("timestamp", flat=True)
+                .first()
+            )
+
+            if up_to is None:
+                return False
+
+        receipts.mark_read(self.scope["user"], sender, up_to)
+        return True
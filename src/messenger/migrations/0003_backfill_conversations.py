@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count, F, Max, Q
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model("messenger", "Message")
+    Conversation = apps.get_model("messenger", "Conversation")
+
+    pairs = {}
+    directions = (
+        Message.objects.filter(sender__isnull=False, recipient__isnull=False)
+        .exclude(sender=F("recipient"))
+        .values("sender", "recipient")
+        .annotate(last=Max("timestamp"), unread=Count("pk", filter=Q(unread=True)))
+        .order_by()
+    )
+
+    for row in directions:
+        key = tuple(sorted((row["sender"], row["recipient"])))
+        pair = pairs.setdefault(key, {"last": row["last"], "unread": {}})
+        pair["last"] = max(pair["last"], row["last"])
+        pair["unread"][row["recipient"]] = row["unread"]
+
+    for (user_one, user_two), pair in pairs.items():
+        last_message = (
+            Message.objects.filter(
+                Q(sender_id=user_one, recipient_id=user_two) | Q(sender_id=user_two, recipient_id=user_one)
+            )
+            .order_by("-timestamp")
+            .first()
+        )
+        Conversation.objects.update_or_create(
+            user_one_id=user_one,
+            user_two_id=user_two,
+            defaults={
+                "last_message": last_message,
+                "last_message_at": pair["last"],
+                "unread_one": pair["unread"].get(user_one, 0),
+                "unread_two": pair["unread"].get(user_two, 0),
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messenger', '0002_conversation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
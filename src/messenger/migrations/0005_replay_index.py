@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messenger', '0004_message_pair_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'timestamp'], name='messenger_message_inbox_idx'),
+        ),
+    ]
@@ -1,44 +1,70 @@
-import uuid
-
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.db import models
 from django.db import transaction
+from django.db.models import Count, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from src.identifiers import uuid7
+from src.pagination import encode_cursor, keyset_page
 
 
 class MessageQuerySet(models.query.QuerySet):
     def get_conversation(self, sender, recipient):
-        qs_one = self.filter(sender=sender, recipient=recipient)
-        qs_two = self.filter(sender=recipient, recipient=sender)
-
-        return qs_one.union(qs_two).order_by("timestamp")
+        return self.filter(
+            Q(sender=sender, recipient=recipient) | Q(sender=recipient, recipient=sender)
+        ).order_by("timestamp")
 
-    def get_most_recent_conversation(self, recipient):
-        try:
-            qs_sent = self.filter(sender=recipient)
-            qs_received = self.filter(recipient=recipient)
+    def get_history(self, user, other, before=None, size=None):
+        """Returns the ``size`` newest messages of a conversation older than
+        the ``before`` cursor, oldest first, and the cursor of the page of
+        older messages, or None when there are no more."""
+        messages, cursor = keyset_page(
+            self.get_conversation(user, other).select_related("sender", "recipient"),
+            cursor=before,
+            size=size or settings.MESSENGER_PAGE_SIZE,
+        )
+        return messages[::-1], cursor
 
-            qs = qs_sent.union(qs_received).latest("timestamp")
+    def get_missed(self, user, since, size=None):
+        """Returns the messages received by ``user`` after the ``since``
+        cursor, oldest first, and whether more are left beyond ``size``."""
+        messages, cursor = keyset_page(
+            self.filter(recipient=user).select_related("sender", "recipient"),
+            cursor=since,
+            size=size or settings.MESSENGER_REPLAY_LIMIT,
+            descending=False,
+        )
+        return messages, cursor is not None
 
-            if qs.sender == recipient:
-                return qs.recipient
+    def get_most_recent_conversation(self, recipient):
+        """Returns the other user of the latest conversation of ``recipient``,
+        or ``recipient`` itself when there is none."""
+        conversation = (
+            Conversation.objects.for_user(recipient)
+            .select_related("user_one", "user_two")
+            .first()
+        )
 
-            return qs.sender
+        if conversation is None:
+            return recipient
 
-        except self.model.DoesNotExist:
-            return get_user_model().objects.get(username=recipient.username)
+        return conversation.get_other_user(recipient)
 
     def mark_conversation_as_read(self, sender, recipient):
-        qs = self.filter(sender=sender, recipient=recipient)
-        return qs.update(unread=False)
+        """Marks every message ``recipient`` got from ``sender`` so far as
+        read by moving the conversation's read watermark."""
+        return Conversation.objects.read_up_to(recipient, sender, timezone.now())
 
 
 class Message(models.Model):
     objects = MessageQuerySet.as_manager()
 
-    uuid_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uuid_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name="sent_messages",
@@ -56,35 +82,245 @@ class Message(models.Model):
     )
     timestamp = models.DateTimeField(auto_now_add=True)
     message = models.TextField(max_length=1000, blank=True)
+    # Read state comes from the watermark of the conversation, see
+    # ``Conversation.is_read``. The flag is only cleared by ``mark_as_read``.
     unread = models.BooleanField(default=True, db_index=True)
 
     class Meta:
         verbose_name = "Message"
         verbose_name_plural = "Messages"
         ordering = ("-timestamp",)
+        indexes = [
+            models.Index(fields=["sender", "recipient", "timestamp"], name="messenger_message_pair_idx"),
+            models.Index(fields=["recipient", "timestamp"], name="messenger_message_inbox_idx"),
+        ]
 
     def __str__(self):
         return self.message
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if adding:
+                Conversation.objects.record_message(self)
+
     def mark_as_read(self):
         if self.unread:
             self.unread = False
             self.save()
+            Conversation.objects.read_up_to(self.recipient, self.sender, self.timestamp)
+
+    def serialize(self):
+        return {
+            "id": str(self.uuid_id),
+            "sender": str(self.sender),
+            "recipient": str(self.recipient),
+            "message": self.message,
+            "timestamp": self.timestamp.isoformat(),
+            "cursor": encode_cursor(self.timestamp, self.pk),
+        }
+
+    def get_payload(self):
+        """The channel event announcing this message to its recipient."""
+        payload = {
+            "type": "receive",
+            "key": "message",
+            "message_id": str(self.uuid_id),
+            "sender": str(self.sender),
+            "recipient": str(self.recipient),
+        }
+
+        if settings.MESSENGER_RENDERED_PAYLOADS:
+            # Rendered once here instead of once per receiving socket through
+            # the receive_message view.
+            payload["html"] = render_to_string(
+                "messager/single_message.html", {"message": self},
+            )
+            payload["data"] = self.serialize()
+
+        return payload
 
     @staticmethod
     def send_message(sender, recipient, message):
+        from src.messenger.consumers import user_group
+
         new_message = Message.objects.create(
             sender=sender, recipient=recipient, message=message,
         )
         channel_layer = get_channel_layer()
-        payload = {
-            "type": "receive",
-            "key": "message",
-            "message_id": str(new_message.uuid_id),
-            "sender": str(sender),
-            "recipient": str(recipient),
-        }
+        payload = new_message.get_payload()
+
         transaction.on_commit(
-            lambda: async_to_sync(channel_layer.group_send)(recipient.username, payload)
+            lambda: async_to_sync(channel_layer.group_send)(user_group(recipient.pk), payload)
         )
         return new_message
+
+
+class ConversationQuerySet(models.query.QuerySet):
+    def for_user(self, user):
+        return self.filter(Q(user_one=user) | Q(user_two=user))
+
+    def inbox(self, user):
+        """Conversations of ``user`` with the other participant and the last
+        message loaded in a single query. The unread counts are columns of
+        the conversation itself."""
+        return (
+            self.for_user(user)
+            .filter(last_message_at__isnull=False)
+            .select_related("user_one", "user_two", "last_message")
+        )
+
+    def between(self, user, other):
+        user_one, user_two = sorted((user.pk, other.pk))
+        return self.filter(user_one_id=user_one, user_two_id=user_two)
+
+    def record_message(self, message):
+        """Makes ``message`` the last one of its conversation and counts it as
+        unread for the recipient. The row is locked, so concurrent messages
+        can neither lose an unread increment nor put an older message last."""
+
+        if not message.sender_id or not message.recipient_id:
+            return
+
+        if message.sender_id == message.recipient_id:
+            return
+
+        user_one, user_two = sorted((message.sender_id, message.recipient_id))
+
+        with transaction.atomic():
+            conversation, _ = self.select_for_update().get_or_create(
+                user_one_id=user_one, user_two_id=user_two,
+            )
+
+            if conversation.last_message_at is None or conversation.last_message_at <= message.timestamp:
+                conversation.last_message = message
+                conversation.last_message_at = message.timestamp
+
+            unread_field = conversation.get_unread_field(message.recipient_id)
+            setattr(conversation, unread_field, getattr(conversation, unread_field) + 1)
+            conversation.save()
+
+    def read_up_to(self, reader, other, timestamp):
+        """Moves the read watermark of ``reader`` in its conversation with
+        ``other`` forward to ``timestamp``, recounts the unread messages left
+        after it in the same UPDATE and pushes a read receipt to ``other``.
+        Message rows are not touched. Returns whether the watermark moved."""
+
+        if reader is None or other is None or reader.pk == other.pk:
+            return False
+
+        read_field, unread_field = (
+            ("read_one_at", "unread_one") if reader.pk < other.pk else ("read_two_at", "unread_two")
+        )
+        unread = (
+            Message.objects.filter(sender=other, recipient=reader, timestamp__gt=timestamp)
+            .order_by()
+            .values("recipient")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        moved = (
+            self.between(reader, other)
+            .filter(Q(**{f"{read_field}__isnull": True}) | Q(**{f"{read_field}__lt": timestamp}))
+            .update(**{read_field: timestamp, unread_field: Coalesce(Subquery(unread), 0)})
+        )
+
+        if moved:
+            from src.messenger.consumers import user_group
+
+            channel_layer = get_channel_layer()
+            payload = {
+                "type": "receive",
+                "key": "message.read",
+                "reader": reader.username,
+                "read_at": timestamp.isoformat(),
+            }
+            transaction.on_commit(
+                lambda: async_to_sync(channel_layer.group_send)(user_group(other.pk), payload)
+            )
+
+        return bool(moved)
+
+
+class Conversation(models.Model):
+    """Denormalized summary of the messages exchanged by a pair of users.
+    ``user_one`` always has the lower primary key so a pair has one row."""
+
+    objects = ConversationQuerySet.as_manager()
+
+    user_one = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    user_two = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    last_message = models.ForeignKey(
+        Message,
+        related_name="+",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_one = models.PositiveIntegerField(default=0)
+    unread_two = models.PositiveIntegerField(default=0)
+    read_one_at = models.DateTimeField(null=True, blank=True)
+    read_two_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Conversation"
+        verbose_name_plural = "Conversations"
+        ordering = ("-last_message_at",)
+        constraints = [
+            models.UniqueConstraint(fields=["user_one", "user_two"], name="messenger_conversation_pair"),
+        ]
+        indexes = [
+            models.Index(fields=["user_one", "-last_message_at"], name="messenger_conv_user_one_idx"),
+            models.Index(fields=["user_two", "-last_message_at"], name="messenger_conv_user_two_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_one} - {self.user_two}"
+
+    def get_other_user(self, user):
+        return self.user_two if self.user_one_id == user.pk else self.user_one
+
+    def get_unread_field(self, user_id):
+        return "unread_one" if self.user_one_id == user_id else "unread_two"
+
+    def get_unread_count(self, user):
+        return getattr(self, self.get_unread_field(user.pk))
+
+    def get_read_at(self, user):
+        """Timestamp up to which ``user`` has read the conversation."""
+        return self.read_one_at if self.user_one_id == user.pk else self.read_two_at
+
+    def is_read(self, message):
+        """Whether the recipient of ``message`` has read it."""
+        read_at = self.get_read_at(message.recipient)
+        return read_at is not None and message.timestamp <= read_at
+
+    def serialize(self, user):
+        """Inbox entry of this conversation as seen by ``user``."""
+        other = self.get_other_user(user)
+        last_message = self.last_message
+        read_by_other_at = self.get_read_at(other)
+
+        return {
+            "username": other.username,
+            "name": other.get_profile_name(),
+            "unread": self.get_unread_count(user),
+            "last_message": {
+                "from_me": last_message.sender_id == user.pk,
+                "preview": Truncator(last_message.message).chars(80),
+            } if last_message else None,
+            "timestamp": self.last_message_at.isoformat(),
+            "read_by_other_at": read_by_other_at.isoformat() if read_by_other_at else None,
+        }
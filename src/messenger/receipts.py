@@ -0,0 +1,63 @@
+"""Coalesced read receipts.
+
+Clients report reads on every conversation they open or scroll, which would
+mean a write per event. ``mark_read`` only records the newest reported
+timestamp in the cache, and the first report of an interval schedules the
+``messenger.flush_read`` task that moves the conversation's watermark once
+the interval is over. A conversation is therefore written at most once per
+``MESSENGER_READ_RECEIPT_INTERVAL`` seconds and reader.
+
+The task carries the timestamp of the report that scheduled it, so the
+watermark moves at least that far even when the worker does not see the
+pending timestamp of the cache.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from src.tasks.queue import enqueue
+
+
+def _key(reader_id, other_id):
+    return f"messenger:read:{reader_id}:{other_id}"
+
+
+def mark_read(reader, other, up_to):
+    """Records that ``reader`` read the messages of ``other`` up to the
+    ``up_to`` datetime. A watermark only moves forward, so it is never set
+    past the current time."""
+
+    if reader.pk == other.pk:
+        return
+
+    up_to = min(up_to, timezone.now())
+    key = _key(reader.pk, other.pk)
+    interval = settings.MESSENGER_READ_RECEIPT_INTERVAL
+    pending = get_pending(reader.pk, other.pk)
+
+    if pending is None or pending < up_to:
+        cache.set(key, up_to.isoformat(), interval * 10)
+
+    if cache.add(f"{key}:scheduled", True, interval):
+        enqueue(
+            "messenger.flush_read",
+            delay=timedelta(seconds=interval),
+            reader_id=reader.pk,
+            other_id=other.pk,
+            up_to=up_to.isoformat(),
+        )
+
+
+def get_pending(reader_id, other_id):
+    """The newest read timestamp reported and possibly not written yet."""
+    value = cache.get(_key(reader_id, other_id))
+    return datetime.fromisoformat(value) if value else None
+
+
+def unschedule(reader_id, other_id):
+    """Lets the next report schedule a new flush. Called before the pending
+    timestamp is read, so no report is left without a flush."""
+    cache.delete(f"{_key(reader_id, other_id)}:scheduled")
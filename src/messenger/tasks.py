@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+
+from src.messenger import receipts
+from src.messenger.models import Conversation
+from src.tasks.queue import task
+
+
+@task("messenger.flush_read")
+def flush_read(reader_id, other_id, up_to=None):
+    """Writes the read watermark coalesced by ``receipts.mark_read``, the
+    newest of the pending one and ``up_to``."""
+
+    receipts.unschedule(reader_id, other_id)
+    pending = receipts.get_pending(reader_id, other_id)
+    up_to = datetime.fromisoformat(up_to) if up_to else None
+
+    if pending is not None and (up_to is None or pending > up_to):
+        up_to = pending
+
+    if up_to is None:
+        return
+
+    users = get_user_model().objects.in_bulk([reader_id, other_id])
+
+    if reader_id in users and other_id in users:
+        Conversation.objects.read_up_to(users[reader_id], users[other_id], up_to)
@@ -0,0 +1,263 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from src.messenger.consumers import MessengerConsumer, user_group
+from src.messenger.models import Conversation, Message
+from src.pagination import encode_cursor
+
+
+async def connect(user, query_string=b""):
+    communicator = ApplicationCommunicator(
+        MessengerConsumer.as_asgi(),
+        {
+            "type": "websocket",
+            "path": "/",
+            "query_string": query_string,
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+        },
+    )
+    await communicator.send_input({"type": "websocket.connect"})
+    response = await communicator.receive_output()
+    assert response["type"] == "websocket.accept"
+    return communicator
+
+
+async def send_frame(communicator, **frame):
+    await communicator.send_input({"type": "websocket.receive", "text": json.dumps(frame)})
+
+
+async def receive_frame(communicator):
+    return json.loads((await communicator.receive_output())["text"])
+
+
+async def disconnect(*communicators):
+    for communicator in communicators:
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait()
+
+
+# The consumer reaches the database from worker threads through
+# database_sync_to_async, so the rows have to be committed.
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class MessengerConsumerTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("first_user", password="password")
+        self.other_user = get_user_model().objects.create_user("second_user", password="password")
+
+    def test_send_message(self):
+        async def scenario():
+            sender = await connect(self.user)
+            recipient = await connect(self.other_user)
+
+            await send_frame(sender, type="message.send", to="second_user", message="Hello", client_id="1")
+
+            ack = await receive_frame(sender)
+            event = await receive_frame(recipient)
+
+            assert ack["key"] == "message.ack"
+            assert ack["client_id"] == "1"
+            assert event["key"] == "message"
+            assert event["message_id"] == ack["message_id"]
+
+            await disconnect(sender, recipient)
+
+        async_to_sync(scenario)()
+
+        message = Message.objects.get()
+        assert message.sender == self.user
+        assert message.recipient == self.other_user
+        assert message.message == "Hello"
+
+    def test_send_invalid_message(self):
+        async def scenario():
+            sender = await connect(self.user)
+
+            await send_frame(sender, type="message.send", to="second_user", message=" ", client_id="1")
+            assert (await receive_frame(sender))["error"] == "empty message"
+
+            await send_frame(sender, type="message.send", to="first_user", message="Hi", client_id="2")
+            assert (await receive_frame(sender))["error"] == "unknown recipient"
+
+            await disconnect(sender)
+
+        async_to_sync(scenario)()
+        assert Message.objects.count() == 0
+
+    def test_mark_read(self):
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Hello")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Again")
+
+        async def scenario():
+            reader = await connect(self.user)
+            sender = await connect(self.other_user)
+
+            await send_frame(reader, type="message.read", **{"from": "second_user"})
+            receipt = await receive_frame(sender)
+
+            assert receipt["key"] == "message.read"
+            assert receipt["reader"] == "first_user"
+
+            await send_frame(reader, type="message.read", cursor="nope", **{"from": "second_user"})
+            assert (await receive_frame(reader))["error"] == "invalid cursor"
+
+            await disconnect(reader, sender)
+
+        async_to_sync(scenario)()
+        assert Conversation.objects.get().get_unread_count(self.user) == 0
+
+    def test_mark_read_uses_stored_timestamp(self):
+        read = Message.objects.create(sender=self.other_user, recipient=self.user, message="Hello")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Again")
+        foreign = Message.objects.create(sender=self.user, recipient=self.other_user, message="Mine")
+
+        async def scenario():
+            reader = await connect(self.user)
+
+            for timestamp in [datetime(2099, 1, 1, tzinfo=timezone.utc), datetime(2099, 1, 1)]:
+                cursor = encode_cursor(timestamp, read.pk)
+                await send_frame(reader, type="message.read", cursor=cursor, **{"from": "second_user"})
+
+            cursor = encode_cursor(foreign.timestamp, foreign.pk)
+            await send_frame(reader, type="message.read", cursor=cursor, **{"from": "second_user"})
+            assert (await receive_frame(reader))["error"] == "invalid cursor"
+
+            await disconnect(reader)
+
+        async_to_sync(scenario)()
+
+        conversation = Conversation.objects.get()
+        assert conversation.get_read_at(self.user) == read.timestamp
+        assert conversation.get_unread_count(self.user) == 1
+
+    def test_typing(self):
+        async def scenario():
+            typist = await connect(self.user)
+            recipient = await connect(self.other_user)
+
+            await send_frame(typist, type="typing", to="second_user")
+
+            event = await receive_frame(recipient)
+            assert event["sender"] == "first_user"
+            assert event["active"] is True
+            assert 0 < event["expires_in"] <= 6
+            assert await typist.receive_nothing()
+
+            for _ in range(10):
+                await send_frame(typist, type="typing", to="second_user")
+
+            assert await recipient.receive_nothing()
+
+            await send_frame(typist, type="typing", to="second_user", active=False)
+            assert (await receive_frame(recipient))["active"] is False
+
+            await send_frame(typist, type="typing", to="second_user")
+            assert (await receive_frame(recipient))["active"] is True
+
+            await disconnect(typist, recipient)
+
+        with CaptureQueriesContext(connection) as context:
+            async_to_sync(scenario)()
+
+        # Only the recipient lookup of the first frame reaches the database.
+        assert len([query for query in context.captured_queries if "messenger" in query["sql"]]) == 0
+        assert len([query for query in context.captured_queries if "users_user" in query["sql"]]) == 1
+        assert not Message.objects.exists()
+
+    @override_settings(MESSENGER_TYPING_TARGETS=2)
+    def test_typing_targets_are_bounded(self):
+        async def scenario():
+            typist = await connect(self.user)
+
+            for username in ["ghost_0", "ghost_1", "ghost_2", "ghost_0"]:
+                await send_frame(typist, type="typing", to=username)
+
+            # Frames are handled in order, the presence answer comes last.
+            await send_frame(typist, type="presence.watch", users=[])
+            assert (await receive_frame(typist))["key"] == "presence"
+
+            await disconnect(typist)
+
+        with CaptureQueriesContext(connection) as context:
+            async_to_sync(scenario)()
+
+        # ``ghost_0`` was evicted by ``ghost_2`` and looked up again.
+        assert len([query for query in context.captured_queries if "users_user" in query["sql"]]) == 4
+
+    def test_stale_typing_event_is_dropped(self):
+        async def scenario():
+            recipient = await connect(self.other_user)
+
+            await get_channel_layer().group_send(
+                user_group(self.other_user.pk),
+                {"type": "typing", "sender": "first_user", "active": True, "sent_at": time.time() - 60},
+            )
+            assert await recipient.receive_nothing()
+
+            await disconnect(recipient)
+
+        async_to_sync(scenario)()
+
+    def test_presence_frames_still_handled(self):
+        async def scenario():
+            watcher = await connect(self.user)
+
+            await send_frame(watcher, type="presence.watch", users=["second_user"])
+            assert await receive_frame(watcher) == {"key": "presence", "users": {"second_user": False}}
+
+            await disconnect(watcher)
+
+        async_to_sync(scenario)()
+
+    def test_reconnect_replays_missed_messages(self):
+        seen = Message.objects.create(sender=self.other_user, recipient=self.user, message="Seen")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Missed")
+        Message.objects.create(sender=self.user, recipient=self.other_user, message="Sent")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Missed again")
+        since = encode_cursor(seen.timestamp, seen.pk).encode()
+
+        async def scenario():
+            reader = await connect(self.user, b"since=" + since)
+
+            replayed = [await receive_frame(reader), await receive_frame(reader)]
+            assert [event["data"]["message"] for event in replayed] == ["Missed", "Missed again"]
+            assert await receive_frame(reader) == {"key": "replay.done", "truncated": False}
+
+            await disconnect(reader)
+
+        async_to_sync(scenario)()
+
+    def test_reconnect_too_far_behind(self):
+        seen = Message.objects.create(sender=self.other_user, recipient=self.user, message="Seen")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Missed")
+        Message.objects.create(sender=self.other_user, recipient=self.user, message="Missed again")
+        since = encode_cursor(seen.timestamp, seen.pk).encode()
+
+        async def scenario():
+            reader = await connect(self.user, b"since=" + since)
+
+            assert (await receive_frame(reader))["data"]["message"] == "Missed"
+            assert await receive_frame(reader) == {"key": "replay.done", "truncated": True}
+
+            await disconnect(reader)
+
+        with self.settings(MESSENGER_REPLAY_LIMIT=1):
+            async_to_sync(scenario)()
+
+    def test_reconnect_with_bad_cursor(self):
+        async def scenario():
+            reader = await connect(self.user, b"since=nope")
+            assert await receive_frame(reader) == {"key": "replay.done", "truncated": True}
+            await disconnect(reader)
+
+        async_to_sync(scenario)()
@@ -1,6 +1,13 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.test import override_settings
 from test_plus.plugin import TestCase
 
-from src.messenger.models import Message
+from src.messenger import receipts
+from src.messenger.consumers import user_group
+from src.messenger.models import Conversation, Message
+from src.tasks.models import Task
 
 
 class MessengerModelsTest(TestCase):
@@ -39,6 +46,36 @@ class MessengerModelsTest(TestCase):
         active_user = Message.objects.get_most_recent_conversation(self.user)
         assert active_user == self.other_user
 
+    def test_recent_conversation_single_query(self):
+        with self.assertNumQueries(1):
+            active_user = Message.objects.get_most_recent_conversation(self.other_user)
+
+        assert active_user == self.user
+
+        loner = self.make_user("loner")
+        assert Message.objects.get_most_recent_conversation(loner) == loner
+
+    def test_conversation_summary(self):
+        conversation = Conversation.objects.between(self.user, self.other_user).get()
+
+        assert conversation.last_message == self.third_message
+        assert conversation.get_unread_count(self.other_user) == 2
+        assert conversation.get_unread_count(self.user) == 1
+        assert conversation.get_other_user(self.user) == self.other_user
+
+        new_message = Message.send_message(self.user, self.other_user, "Another one.")
+        conversation.refresh_from_db()
+
+        assert conversation.last_message == new_message
+        assert conversation.get_unread_count(self.other_user) == 3
+
+        self.third_message.mark_as_read()
+        Message.objects.mark_conversation_as_read(self.user, self.other_user)
+        conversation.refresh_from_db()
+
+        assert conversation.get_unread_count(self.other_user) == 0
+        assert conversation.get_unread_count(self.user) == 0
+
     def test_single_marking_as_read(self):
         self.first_message.mark_as_read()
         read_message = Message.objects.filter(unread=False)
@@ -48,3 +85,79 @@ class MessengerModelsTest(TestCase):
         initial_count = Message.objects.count()
         Message.send_message(self.other_user, self.user, "A follow up answer message.")
         assert Message.objects.count() == initial_count + 1
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_sending_pushes_rendered_message(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(user_group(self.user.pk), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message = Message.send_message(self.other_user, self.user, "Pushed message.")
+
+        event = async_to_sync(channel_layer.receive)(channel)
+
+        assert event["message_id"] == str(message.uuid_id)
+        assert event["data"]["message"] == "Pushed message."
+        assert event["data"]["sender"] == "other_test_user"
+        assert "html" in event
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_read_watermark(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(user_group(self.user.pk), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assert Conversation.objects.read_up_to(self.other_user, self.user, self.first_message.timestamp)
+
+        conversation = Conversation.objects.between(self.user, self.other_user).get()
+        assert conversation.get_read_at(self.other_user) == self.first_message.timestamp
+        assert conversation.get_unread_count(self.other_user) == 1
+        assert conversation.is_read(self.first_message)
+        assert not conversation.is_read(self.second_message)
+        assert Message.objects.filter(unread=True).count() == 3
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        assert event["key"] == "message.read"
+        assert event["reader"] == "other_test_user"
+
+        assert not Conversation.objects.read_up_to(self.other_user, self.user, self.first_message.timestamp)
+
+    def test_read_receipts_are_coalesced(self):
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            receipts.mark_read(self.other_user, self.user, self.first_message.timestamp)
+            receipts.mark_read(self.other_user, self.user, self.second_message.timestamp)
+            receipts.mark_read(self.other_user, self.user, self.first_message.timestamp)
+
+            task = Task.objects.get()
+            assert task.name == "messenger.flush_read"
+
+            conversation = Conversation.objects.between(self.user, self.other_user).get()
+            assert conversation.get_read_at(self.other_user) is None
+
+            task.execute()
+
+        conversation.refresh_from_db()
+        assert conversation.get_read_at(self.other_user) == self.second_message.timestamp
+        assert conversation.get_unread_count(self.other_user) == 0
+
+    def test_read_receipt_flush_without_shared_cache(self):
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            receipts.mark_read(self.other_user, self.user, self.second_message.timestamp)
+            # The worker process does not see the web process' cache.
+            cache.clear()
+            Task.objects.get().execute()
+
+        conversation = Conversation.objects.between(self.user, self.other_user).get()
+        assert conversation.get_read_at(self.other_user) == self.second_message.timestamp
+        assert conversation.get_unread_count(self.other_user) == 0
+
+    def test_keys_are_time_ordered(self):
+        messages = [
+            Message.objects.create(sender=self.user, recipient=self.other_user, message=str(i))
+            for i in range(20)
+        ]
+
+        assert all(message.uuid_id.version == 7 for message in messages)
+        assert sorted(messages, key=lambda message: message.uuid_id) == messages
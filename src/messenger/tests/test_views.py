@@ -1,8 +1,12 @@
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from test_plus.test import TestCase
 
-from src.messenger.models import Message
+from src.messenger.models import Conversation, Message
+from src.pagination import encode_cursor
 
 
 class MessengerViewsTests(TestCase):
@@ -117,3 +121,162 @@ class MessengerViewsTests(TestCase):
             HTTP_X_REQUESTED_WITH="XMLHttpRequest",
         )
         assert request.status_code == 405
+
+    def test_conversation_opens_on_newest_messages(self):
+        for i in range(60):
+            Message.objects.create(sender=self.other_user, recipient=self.user, message=f"Message {i}")
+
+        response = self.client.get(reverse("messenger:messages_list"))
+        message_list = response.context["message_list"]
+
+        assert len(message_list) == 50
+        assert str(message_list[-1]) == "Message 59"
+        assert response.context["next_cursor"] is not None
+
+    def test_conversation_history(self):
+        for i in range(120):
+            Message.objects.create(sender=self.other_user, recipient=self.user, message=f"Message {i}")
+
+        received = []
+        queries = []
+        cursor = None
+
+        while True:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse("messenger:conversation_history", kwargs={"username": "second_user"}),
+                    {"before": cursor} if cursor else {},
+                    HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                )
+
+            assert response.status_code == 200
+            queries.append(context.captured_queries)
+            received = [message["message"] for message in response.json()["messages"]] + received
+            cursor = response.json()["next_cursor"]
+
+            if cursor is None:
+                break
+
+        assert len(received) == 123
+        assert received[0] == "A not that long message."
+        assert received[-1] == "Message 119"
+        assert len({len(page) for page in queries}) == 1
+        assert not any("OFFSET" in query["sql"] for page in queries for query in page)
+
+    def test_conversation_history_tampered_cursor(self):
+        response = self.client.get(
+            reverse("messenger:conversation_history", kwargs={"username": "second_user"}),
+            {"before": encode_cursor(timezone.now(), "not-a-pk")},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert response.status_code == 400
+
+    def test_inbox(self):
+        third_user = self.make_user("third_user")
+        Message.objects.create(sender=third_user, recipient=self.user, message="Hello there.")
+
+        response = self.client.get(reverse("messenger:inbox"), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        conversations = response.json()["conversations"]
+
+        assert response.status_code == 200
+        assert [entry["username"] for entry in conversations] == ["third_user", "second_user"]
+        assert conversations[0]["unread"] == 1
+        assert conversations[0]["last_message"] == {"from_me": False, "preview": "Hello there."}
+        assert conversations[1]["unread"] == 1
+        assert response.json()["next_cursor"] is None
+
+        response = self.other_client.get(reverse("messenger:inbox"), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        assert response.json()["conversations"][0]["unread"] == 2
+        assert response.json()["conversations"][0]["last_message"]["from_me"] is True
+
+    def test_inbox_pagination(self):
+        for i in range(30):
+            Message.objects.create(
+                sender=self.make_user(f"user_{i}"), recipient=self.user, message=f"Message {i}",
+            )
+
+        received = []
+        queries = []
+        cursor = None
+
+        while True:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse("messenger:inbox"),
+                    {"cursor": cursor} if cursor else {},
+                    HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                )
+
+            queries.append(len(context.captured_queries))
+            received += [entry["username"] for entry in response.json()["conversations"]]
+            cursor = response.json()["next_cursor"]
+
+            if cursor is None:
+                break
+
+        assert len(received) == 31
+        assert len(set(received)) == 31
+        assert received[0] == "user_29"
+        assert len(set(queries)) == 1
+
+    def test_inbox_bad_cursor(self):
+        response = self.client.get(
+            reverse("messenger:inbox"), {"cursor": "nope"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert response.status_code == 400
+
+    def test_sidebar_lists_recent_conversations(self):
+        self.make_user("stranger")
+
+        response = self.client.get(reverse("messenger:messages_list"))
+
+        assert "users_list" not in response.context
+        assert [
+            conversation.get_other_user(self.user).username
+            for conversation in response.context["conversation_list"]
+        ] == ["second_user"]
+
+    def test_contacts(self):
+        self.make_user("second_admin")
+        self.make_user("secretary")
+        named = self.make_user("someone")
+        named.name = "Seconda"
+        named.save()
+        inactive = self.make_user("second_inactive")
+        inactive.is_active = False
+        inactive.save()
+
+        response = self.client.get(
+            reverse("messenger:contacts"), {"q": "SECOND"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        assert response.status_code == 200
+        assert response.json()["users"] == [
+            {"username": "second_admin", "name": ""},
+            {"username": "second_user", "name": ""},
+            {"username": "someone", "name": "Seconda"},
+        ]
+
+    def test_contacts_limit(self):
+        for i in range(5):
+            self.make_user(f"contact_{i}")
+
+        with self.settings(MESSENGER_CONTACTS_LIMIT=3):
+            response = self.client.get(
+                reverse("messenger:contacts"), {"q": "contact"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+        assert len(response.json()["users"]) == 3
+
+        response = self.client.get(reverse("messenger:contacts"), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        assert response.json()["users"] == []
+
+    def test_opening_conversation_marks_it_read(self):
+        self.other_client.get(
+            reverse("messenger:conversation_detail", kwargs={"username": self.user.username})
+        )
+
+        conversation = Conversation.objects.between(self.user, self.other_user).get()
+        assert conversation.get_read_at(self.other_user) == self.second_message.timestamp
+        assert conversation.get_unread_count(self.other_user) == 0
+        assert conversation.get_unread_count(self.user) == 1
@@ -8,6 +8,13 @@ urlpatterns = [
     re_path(r"^$", views.MessagesListView.as_view(), name="messages_list"),
     re_path(r"^send-message/$", views.send_message, name="send_message"),
     re_path(r"^receive-message/$", views.receive_message, name="receive_message"),
+    re_path(r"^~inbox/$", views.inbox, name="inbox"),
+    re_path(r"^~contacts/$", views.contacts, name="contacts"),
+    re_path(
+        r"^(?P<username>[\w.@+-]+)/history/$",
+        views.conversation_history,
+        name="conversation_history",
+    ),
     re_path(
         r"^(?P<username>[\w.@+-]+)/$",
         views.ConversationListView.as_view(),
@@ -1,49 +1,137 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 # from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse
-from django.shortcuts import render
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_http_methods
 from django.views.generic import ListView
 
 from src.decorators import ajax_required
-from src.messenger.models import Message
+from src.messenger import receipts
+from src.messenger.models import Conversation, Message
+from src.pagination import keyset_page
 
 
 class MessagesListView(LoginRequiredMixin, ListView):
+    """Opens a conversation on its newest messages, older ones are loaded
+    through ``conversation_history`` while scrolling back."""
+
     model = Message
-    paginate_by = 50
+    context_object_name = "message_list"
     template_name = "messager/message_list.html"
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        context["users_list"] = (
-            get_user_model()
-            .objects.filter(is_active=True)
-            .exclude(username=self.request.user)
-            .order_by("username")
-        )
-        last_conversation = Message.objects.get_most_recent_conversation(
-            self.request.user,
+        # Only the most recent conversations are listed, other users are
+        # looked up through the contacts search endpoint.
+        context["conversation_list"], context["conversations_cursor"] = keyset_page(
+            Conversation.objects.inbox(self.request.user),
+            size=settings.MESSENGER_INBOX_PAGE_SIZE,
+            field="last_message_at",
         )
-        context["active"] = last_conversation.username
+        context["active"] = self.get_active_user().username
+        context["next_cursor"] = self.next_cursor
         return context
 
+    def get_active_user(self):
+        """The other user of the displayed conversation, resolved once per
+        request."""
+        if not hasattr(self, "active_user"):
+            self.active_user = Message.objects.get_most_recent_conversation(self.request.user)
+
+        return self.active_user
+
     def get_queryset(self):
-        active_user = Message.objects.get_most_recent_conversation(self.request.user)
-        return Message.objects.get_conversation(active_user, self.request.user)
+        messages, self.next_cursor = Message.objects.get_history(
+            self.request.user, self.get_active_user(),
+        )
+        received = [message.timestamp for message in messages if message.recipient_id == self.request.user.pk]
+
+        if received:
+            receipts.mark_read(self.request.user, self.get_active_user(), max(received))
+
+        return messages
 
 
 class ConversationListView(MessagesListView):
-    def get_context_data(self, *args, **kwargs):
-        context = super().get_context_data(*args, **kwargs)
-        context["active"] = self.kwargs["username"]
-        return context
+    def get_active_user(self):
+        if not hasattr(self, "active_user"):
+            self.active_user = get_user_model().objects.get(username=self.kwargs["username"])
 
-    def get_queryset(self):
-        active_user = get_user_model().objects.get(username=self.kwargs["username"])
-        return Message.objects.get_conversation(active_user, self.request.user)
+        return self.active_user
+
+
+@login_required
+@ajax_required
+@require_http_methods(["GET"])
+def conversation_history(request, username):
+    """AJAX functional view returning the page of messages older than the
+    ``before`` cursor, for lazy backward scrolling."""
+    other = get_object_or_404(get_user_model(), username=username)
+
+    try:
+        messages, next_cursor = Message.objects.get_history(
+            request.user, other, before=request.GET.get("before"),
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    html = render_to_string(
+        "messager/message_list.html", {"message_list": messages, "request": request},
+    )
+    return JsonResponse({
+        "html": html,
+        "messages": [message.serialize() for message in messages],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+@ajax_required
+@require_http_methods(["GET"])
+def inbox(request):
+    """AJAX functional view returning the conversations of the user, most
+    recently active first, with the unread count and a preview of the last
+    message of each one, in a single query per page."""
+    try:
+        conversations, next_cursor = keyset_page(
+            Conversation.objects.inbox(request.user),
+            request.GET.get("cursor"),
+            size=settings.MESSENGER_INBOX_PAGE_SIZE,
+            field="last_message_at",
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    return JsonResponse({
+        "conversations": [conversation.serialize(request.user) for conversation in conversations],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+@ajax_required
+@require_http_methods(["GET"])
+def contacts(request):
+    """AJAX functional view returning the active users whose username or
+    name starts with ``q``, to start new conversations from the sidebar."""
+    query = request.GET.get("q", "").strip()
+
+    if not query:
+        return JsonResponse({"users": []})
+
+    users = (
+        get_user_model()
+        .objects.filter(Q(username__istartswith=query) | Q(name__istartswith=query), is_active=True)
+        .exclude(pk=request.user.pk)
+        .order_by("username")
+        .values("username", "name")[:settings.MESSENGER_CONTACTS_LIMIT]
+    )
+    return JsonResponse({"users": list(users)})
 
 
 @login_required
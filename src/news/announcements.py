@@ -0,0 +1,61 @@
+"""Coalesced announcements of new posts.
+
+Clients refetch the feed when told about new posts, so announcing every post
+as it is published would make a burst of posts a burst of refetches by every
+client. The first post of an interval schedules the ``news.announce`` task
+with its timestamp; once the interval is over the task counts the posts
+published in the database and sends a single ``additional_news`` event.
+
+Every announcement covers a closed window, from where the previous one
+stopped up to the time it runs, so a post is never counted twice even when
+two announcements overlap. The cache remembers that end and which
+announcement is scheduled.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from src.tasks.queue import enqueue
+
+SCHEDULED_KEY = "news:announcements:scheduled"
+ANNOUNCED_KEY = "news:announcements:announced_up_to"
+
+
+def announce(news):
+    interval = settings.NEWS_ANNOUNCE_INTERVAL
+    since = news.timestamp.isoformat()
+
+    # The marker outlives the delay, a worker running late must not let a
+    # second announcement be scheduled meanwhile.
+    if cache.add(SCHEDULED_KEY, since, interval * 3):
+        enqueue("news.announce", delay=timedelta(seconds=interval), since=since)
+
+
+def take_pending(since):
+    """Returns the number of posts published since the previous announcement,
+    or since the ``since`` ISO timestamp of the scheduling post, and the
+    author of the latest one. Unschedules the announcement first, so posts
+    published meanwhile schedule the next one."""
+    from src.news.models import News
+
+    if cache.get(SCHEDULED_KEY) == since:
+        cache.delete(SCHEDULED_KEY)
+
+    until = timezone.now()
+    announced_up_to = cache.get(ANNOUNCED_KEY)
+    start = datetime.fromisoformat(since)
+
+    if announced_up_to is not None:
+        start = max(start, datetime.fromisoformat(announced_up_to))
+
+    cache.set(ANNOUNCED_KEY, until.isoformat(), None)
+    posts = News.objects.filter(reply=False, timestamp__gte=start, timestamp__lt=until)
+    latest = posts.select_related("user").order_by("-timestamp", "-pk").first()
+
+    if latest is None:
+        return 0, None
+
+    return posts.count(), latest.user.username if latest.user else None
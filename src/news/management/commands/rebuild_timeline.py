@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from src.news import timeline
+
+
+class Command(BaseCommand):
+    help = "Reloads the cached news timeline from the database."
+
+    def handle(self, *args, **options):
+        ids = timeline.rebuild()
+        self.stdout.write(f"Timeline rebuilt with {len(ids)} news.")
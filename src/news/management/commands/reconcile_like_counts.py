@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from src.news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the likes of the news whose like_count drifted from the "
+        "rows of the likes table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of news updated per query.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report the news whose count is wrong.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = list(
+            News.objects.annotate(actual=Count("liked"))
+            .exclude(like_count=F("actual"))
+            .order_by()
+            .values_list("pk", "like_count", "actual")
+        )
+
+        if options["dry_run"]:
+            for pk, like_count, actual in drifted:
+                self.stdout.write(f"{pk}: {like_count} stored, {actual} counted")
+
+            self.stdout.write(f"Would fix {len(drifted)} news.")
+            return
+
+        # Counted again in the UPDATE itself, so likes toggled since the
+        # drift was detected are not lost.
+        likes = (
+            News.liked.through.objects.filter(news=OuterRef("pk"))
+            .order_by()
+            .values("news")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        batch_size = options["batch_size"]
+
+        for start in range(0, len(drifted), batch_size):
+            batch = [pk for pk, _, _ in drifted[start:start + batch_size]]
+            News.objects.filter(pk__in=batch).update(like_count=Coalesce(Subquery(likes), 0))
+
+        self.stdout.write(f"Fixed {len(drifted)} news.")
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import src.identifiers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news',
+            name='uuid_id',
+            field=models.UUIDField(default=src.identifiers.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
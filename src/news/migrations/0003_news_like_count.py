@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 13:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    News = apps.get_model("news", "News")
+    likes = (
+        News.liked.through.objects.filter(news=OuterRef("pk"))
+        .order_by()
+        .values("news")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    News.objects.update(like_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_time_ordered_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
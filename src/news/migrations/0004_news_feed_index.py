@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_news_like_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['reply', '-timestamp', '-uuid_id'], name='news_feed_idx'),
+        ),
+    ]
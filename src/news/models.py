@@ -1,16 +1,59 @@
-import uuid
-
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 
+from src.identifiers import uuid7
+from src.news import announcements, timeline
 from src.notifications.models import notification_handler, Notification
 
 
+class NewsQuerySet(models.query.QuerySet):
+    def feed(self, user=None):
+        """Top-level news with their author, like and reply counts and, for
+        ``user``, whether they liked each one, all loaded in a single
+        query."""
+        replies = (
+            News.objects.filter(parent=OuterRef("pk"))
+            .order_by()
+            .values("parent")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+
+        if user is not None and user.is_authenticated:
+            liked = Exists(News.liked.through.objects.filter(news=OuterRef("pk"), user_id=user.pk))
+        else:
+            liked = Value(False, output_field=models.BooleanField())
+
+        return (
+            self.filter(reply=False)
+            .select_related("user")
+            .annotate(
+                likers_count=F("like_count"),
+                thread_count=Coalesce(Subquery(replies), 0),
+                liked_by_viewer=liked,
+                viewer_id=Value(user.pk if user is not None else None, output_field=models.IntegerField()),
+            )
+        )
+
+    def interactions(self, ids):
+        """Like and reply counts of the news ``ids``, keyed by their string
+        pk, from a single grouped query."""
+        rows = (
+            self.filter(pk__in=ids)
+            .order_by()
+            .annotate(comments=Count("thread"))
+            .values_list("pk", "like_count", "comments")
+        )
+        return {str(pk): {"likes": likes, "comments": comments} for pk, likes, comments in rows}
+
+
 class News(models.Model):
-    uuid_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    objects = NewsQuerySet.as_manager()
+
+    uuid_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True,
@@ -30,20 +73,25 @@ class News(models.Model):
         blank=True,
         related_name="liked_news",
     )
+    like_count = models.PositiveIntegerField(default=0)
     reply = models.BooleanField(verbose_name="Is a reply?", default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
 
+        if adding and not self.reply:
+            transaction.on_commit(lambda: timeline.push(self))
+            transaction.on_commit(lambda: announcements.announce(self))
+
+    def delete(self, *args, **kwargs):
         if not self.reply:
-            channel_layer = get_channel_layer()
-            payload = {
-                "type": "receive",
-                "key": "additional_news",
-                "actor_name": self.user.username,
-            }
-            async_to_sync(channel_layer.group_send)("notifications", payload)
+            # ``delete()`` clears the pk before the transaction commits.
+            news_id = self.pk
+            transaction.on_commit(lambda: timeline.remove(news_id))
+
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
         return str(self.content)
@@ -52,10 +100,26 @@ class News(models.Model):
         return reverse("news:detail", kwargs={"uuid_id": self.uuid})
 
     def switch_like(self, user):
-        if user in self.liked.all():
-            self.liked.remove(user)
-        else:
-            self.liked.add(user)
+        """Likes or unlikes the news for ``user`` and returns the new number
+        of likers. The news row stays locked while the like is toggled, so
+        concurrent toggles run one after the other and ``like_count`` stays
+        exact."""
+        likes = News.liked.through.objects.filter(news_id=self.pk, user_id=user.pk)
+
+        with transaction.atomic():
+            like_count = News.objects.select_for_update().values_list("like_count", flat=True).get(pk=self.pk)
+            deleted, _ = likes.delete()
+
+            if deleted:
+                delta = -1
+            else:
+                News.liked.through.objects.create(news_id=self.pk, user_id=user.pk)
+                delta = 1
+
+            News.objects.filter(pk=self.pk).update(like_count=F("like_count") + delta)
+
+        self.like_count = like_count + delta
+        return self.like_count
 
     def get_parent(self):
         if self.parent:
@@ -85,11 +149,23 @@ class News(models.Model):
         return parent.thread.all()
 
     def count_thread(self):
+        if hasattr(self, "thread_count"):
+            return self.thread_count
+
         return self.get_thread().count()
 
     def count_likers(self):
+        if hasattr(self, "likers_count"):
+            return self.likers_count
+
         return self.liked.count()
 
+    def is_liked_by(self, user):
+        if getattr(self, "viewer_id", None) == user.pk:
+            return self.liked_by_viewer
+
+        return self.liked.filter(pk=user.pk).exists()
+
     def get_likers(self):
         return self.liked.all()
 
@@ -97,3 +173,6 @@ class News(models.Model):
         verbose_name = "News"
         verbose_name_plural = "News"
         ordering = ("-timestamp",)
+        indexes = [
+            models.Index(fields=["reply", "-timestamp", "-uuid_id"], name="news_feed_idx"),
+        ]
@@ -0,0 +1,26 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from src.news import announcements
+from src.notifications.consumers import GLOBAL_GROUP
+from src.tasks.queue import task
+
+
+@task("news.announce")
+def announce_news(since):
+    """Tells the clients subscribed to site-wide events how many posts were
+    published since the previous announcement."""
+
+    count, actor_name = announcements.take_pending(since)
+
+    if not count:
+        return
+
+    channel_layer = get_channel_layer()
+    payload = {
+        "type": "receive",
+        "key": "additional_news",
+        "actor_name": actor_name,
+        "count": count,
+    }
+    async_to_sync(channel_layer.group_send)(GLOBAL_GROUP, payload)
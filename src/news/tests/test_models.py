@@ -1,6 +1,20 @@
+import threading
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
 from test_plus.test import TestCase
 
+from src.news import announcements
 from src.news.models import News
+from src.notifications.consumers import GLOBAL_GROUP
+from src.tasks.models import Task
 
 
 class NewsModelsTest(TestCase):
@@ -35,3 +49,133 @@ class NewsModelsTest(TestCase):
 
         assert self.first_news.count_likers() == 1
         assert self.user in self.first_news.get_likers()
+
+    def test_like_count(self):
+        assert self.first_news.switch_like(self.user) == 1
+        assert self.first_news.switch_like(self.other_user) == 2
+        assert self.first_news.switch_like(self.user) == 1
+
+        self.first_news.refresh_from_db()
+        assert self.first_news.like_count == 1
+        assert list(self.first_news.get_likers()) == [self.other_user]
+
+    def test_reconcile_like_counts(self):
+        self.first_news.switch_like(self.user)
+        News.objects.filter(pk=self.first_news.pk).update(like_count=7)
+        News.objects.filter(pk=self.second_news.pk).update(like_count=2)
+
+        out = StringIO()
+        call_command("reconcile_like_counts", dry_run=True, stdout=out)
+        assert "Would fix 2 news." in out.getvalue()
+        assert News.objects.get(pk=self.first_news.pk).like_count == 7
+
+        call_command("reconcile_like_counts", stdout=StringIO())
+        assert News.objects.get(pk=self.first_news.pk).like_count == 1
+        assert News.objects.get(pk=self.second_news.pk).like_count == 0
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NewsAnnouncementsTest(TestCase):
+    def setUp(self):
+        self.user = self.make_user("test_user")
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(GLOBAL_GROUP, self.channel)
+
+    def test_only_inserted_news_are_announced(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            news = News.objects.create(user=self.user, content="New post")
+
+        assert len(callbacks) == 2
+        event = async_to_sync(self.channel_layer.receive)(self.channel)
+        assert event["key"] == "additional_news"
+        assert event["count"] == 1
+        assert event["actor_name"] == "test_user"
+
+        with mock.patch("src.news.announcements.announce") as announce, \
+                self.captureOnCommitCallbacks(execute=True):
+            news.content = "Edited post"
+            news.save()
+            news.reply_this(self.user, "A reply")
+
+        announce.assert_not_called()
+
+    def test_announcements_are_coalesced(self):
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    News.objects.create(user=self.user, content=f"Post {i}")
+
+            task = Task.objects.get()
+            assert task.name == "news.announce"
+            assert task.run_after > task.timestamp
+
+            task.execute()
+
+        event = async_to_sync(self.channel_layer.receive)(self.channel)
+        assert event["count"] == 3
+
+    def test_announcement_without_shared_cache(self):
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(user=self.user, content="First post")
+                News.objects.create(user=self.make_user("other_user"), content="Second post")
+
+            # The worker process does not see the web process' cache.
+            cache.clear()
+            Task.objects.get().execute()
+
+        event = async_to_sync(self.channel_layer.receive)(self.channel)
+        assert event["count"] == 2
+        assert event["actor_name"] == "other_user"
+
+    def test_overlapping_announcements_count_each_post_once(self):
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(user=self.user, content="First post")
+
+            # The marker expired before the worker ran the first task.
+            cache.delete(announcements.SCHEDULED_KEY)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(user=self.user, content="Second post")
+
+            first_task, second_task = Task.objects.order_by("timestamp")
+            first_task.execute()
+            second_task.execute()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                News.objects.create(user=self.user, content="Third post")
+
+            Task.objects.get().execute()
+
+        counts = [async_to_sync(self.channel_layer.receive)(self.channel)["count"] for _ in range(2)]
+        assert counts == [2, 1]
+
+
+class NewsLikeConcurrencyTest(TransactionTestCase):
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_concurrent_likes_are_all_counted(self):
+        users = [get_user_model().objects.create_user(f"user_{i}") for i in range(8)]
+        news = News.objects.create(user=users[0], content="Popular news")
+        barrier = threading.Barrier(len(users))
+
+        def like(user):
+            barrier.wait()
+
+            try:
+                News.objects.get(pk=news.pk).switch_like(user)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=like, args=(user,)) for user in users]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        news.refresh_from_db()
+        assert news.like_count == len(users)
+        assert news.count_likers() == len(users)
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+from test_plus.test import TestCase
+
+from src.news import timeline
+from src.news.models import News
+from src.news.timeline import Timeline
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.user = self.make_user("test_user")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first_news = News.objects.create(user=self.user, content="First")
+            self.second_news = News.objects.create(user=self.user, content="Second")
+
+    def test_new_news_are_pushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            third_news = News.objects.create(user=self.user, content="Third")
+            third_news.reply_this(self.user, "A reply")
+            third_news.content = "Third, edited"
+            third_news.save()
+
+        assert timeline.get_ids() == [
+            str(third_news.pk), str(self.second_news.pk), str(self.first_news.pk),
+        ]
+
+    def test_deleted_news_are_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second_news.delete()
+
+        assert timeline.get_ids() == [str(self.first_news.pk)]
+
+    def test_cold_cache_is_rebuilt(self):
+        timeline.get_ids()
+        cache.clear()
+
+        assert timeline.get_ids() == [str(self.second_news.pk), str(self.first_news.pk)]
+        assert get_redis_connection().exists(timeline.KEY)
+
+    def test_updates_keep_the_expiry(self):
+        redis = get_redis_connection()
+        timeline.get_ids()
+        redis.expire(timeline.KEY, 60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third_news = News.objects.create(user=self.user, content="Third")
+            self.first_news.delete()
+
+        assert timeline.get_ids() == [str(third_news.pk), str(self.second_news.pk)]
+        assert 0 < redis.ttl(timeline.KEY) <= 60
+
+        redis.delete(timeline.KEY)
+        assert timeline.get_ids() == [str(third_news.pk), str(self.second_news.pk)]
+        assert 60 < redis.ttl(timeline.KEY) <= settings.NEWS_TIMELINE_TIMEOUT
+
+    def test_push_leaves_missing_timeline_alone(self):
+        get_redis_connection().delete(timeline.KEY)
+        timeline.push(self.first_news)
+
+        assert not get_redis_connection().exists(timeline.KEY)
+
+    def test_rebuild_command(self):
+        News.objects.create(user=self.user, content="Not pushed")
+        out = StringIO()
+
+        call_command("rebuild_timeline", stdout=out)
+
+        assert "3 news" in out.getvalue()
+        assert len(timeline.get_ids()) == 3
+
+    def test_slices_are_loaded_by_id(self):
+        feed = Timeline(self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            news = feed[0:2]
+
+        assert news == [self.second_news, self.first_news]
+        assert len(context.captured_queries) == 1
+        assert "IN" in context.captured_queries[0]["sql"]
+        assert "ORDER BY" not in context.captured_queries[0]["sql"]
+
+    def test_deep_pages_fall_back_to_database(self):
+        with self.settings(NEWS_TIMELINE_SIZE=2):
+            timeline.rebuild()
+            oldest = News.objects.create(user=self.user, content="Oldest")
+            News.objects.filter(pk=oldest.pk).update(timestamp=self.first_news.timestamp.replace(year=2000))
+
+            feed = Timeline(self.user)
+
+            assert feed.count() == 3
+            assert feed[0:2] == [self.second_news, self.first_news]
+            assert feed[2:4] == [oldest]
@@ -1,8 +1,12 @@
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from test_plus.test import TestCase
 
 from src.news.models import News
+from src.pagination import encode_cursor
 
 
 class NewsViewsTest(TestCase):
@@ -38,6 +42,40 @@ class NewsViewsTest(TestCase):
         assert self.second_news in response.context["news_list"]
         assert self.third_news not in response.context["news_list"]
 
+    def test_news_list_queries(self):
+        def render_feed():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse("news:list"))
+
+                for news in response.context["news_list"]:
+                    str(news.user)
+                    news.count_likers()
+                    news.count_thread()
+                    news.is_liked_by(self.user)
+
+            return response, len(context.captured_queries)
+
+        self.first_news.switch_like(self.user)
+        render_feed()  # Warms the timeline cache.
+        response, few = render_feed()
+
+        news = {item.pk: item for item in response.context["news_list"]}
+        assert news[self.first_news.pk].count_likers() == 1
+        assert news[self.first_news.pk].count_thread() == 1
+        assert news[self.first_news.pk].is_liked_by(self.user)
+        assert not news[self.first_news.pk].is_liked_by(self.other_user)
+        assert not news[self.second_news.pk].is_liked_by(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(13):
+                item = News.objects.create(user=self.other_user, content=f"News {i}")
+                item.reply_this(self.user, "A reply")
+                item.switch_like(self.other_user)
+
+        response, many = render_feed()
+        assert len(response.context["news_list"]) == 15
+        assert many == few
+
     def test_delete_news(self):
         initial_count = News.objects.count()
         response = self.client.post(
@@ -74,6 +112,19 @@ class NewsViewsTest(TestCase):
         assert self.user in self.first_news.get_likers()
         assert response.json()["likes"] == 1
 
+    def test_like_news_does_not_count(self):
+        self.first_news.switch_like(self.other_user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                reverse("news:like_post"),
+                {"news": self.first_news.pk},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+        assert response.json()["likes"] == 2
+        assert not any("COUNT(" in query["sql"] for query in context.captured_queries)
+
     def test_thread(self):
         response = self.client.get(
             reverse("news:get_thread"),
@@ -138,3 +189,96 @@ class NewsViewsTest(TestCase):
 
         assert fourth_response.json()["likes"] == 2
         assert fourth_response.json()["comments"] == 2
+
+    def test_interactions(self):
+        self.first_news.switch_like(self.user)
+        self.first_news.switch_like(self.other_user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse("news:interactions"),
+                {"id_value": [self.first_news.pk, self.second_news.pk]},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            str(self.first_news.pk): {"likes": 2, "comments": 1},
+            str(self.second_news.pk): {"likes": 0, "comments": 0},
+        }
+        assert len([query for query in context.captured_queries if "news_news" in query["sql"]]) == 1
+
+        unchanged = self.client.get(
+            reverse("news:interactions"),
+            {"id_value": [self.first_news.pk, self.second_news.pk]},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+
+        self.second_news.switch_like(self.user)
+        changed = self.client.get(
+            reverse("news:interactions"),
+            {"id_value": [self.first_news.pk, self.second_news.pk]},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        assert changed.status_code == 200
+        assert changed.json()[str(self.second_news.pk)]["likes"] == 1
+
+    def test_interactions_bad_requests(self):
+        for params in ({}, {"id_value": "not-a-uuid"}, {"id_value": [self.first_news.pk] * 101}):
+            response = self.client.get(
+                reverse("news:interactions"), params, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+            assert response.status_code == 400
+
+    def test_news_list_has_no_count(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("news:list"))
+
+        assert response.context["next_cursor"] is None
+        assert response.context["paginator"] is None
+        assert not any("COUNT(*)" in query["sql"] for query in context.captured_queries)
+
+    def test_news_page(self):
+        for i in range(40):
+            News.objects.create(user=self.other_user, content=f"News {i}")
+
+        response = self.client.get(reverse("news:list"))
+        received = [str(news.pk) for news in response.context["news_list"]]
+        cursor = response.context["next_cursor"]
+        queries = []
+
+        while cursor:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse("news:page"), {"cursor": cursor}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                )
+
+            assert response.status_code == 200
+            queries.append(context.captured_queries)
+            received += response.json()["news"]
+            cursor = response.json()["next_cursor"]
+
+        expected = [
+            str(pk) for pk in News.objects.filter(reply=False).order_by("-timestamp", "-pk").values_list("pk", flat=True)
+        ]
+        assert received == expected
+        assert len({len(page) for page in queries}) == 1
+        assert not any("OFFSET" in query["sql"] or "COUNT(*)" in query["sql"] for page in queries for query in page)
+
+    def test_news_page_bad_cursor(self):
+        response = self.client.get(
+            reverse("news:page"), {"cursor": "nope"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert response.status_code == 400
+
+    def test_news_page_tampered_cursor(self):
+        response = self.client.get(
+            reverse("news:page"),
+            {"cursor": encode_cursor(timezone.now(), "not-a-pk")},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert response.status_code == 400
@@ -0,0 +1,107 @@
+"""Cached timeline of the newest top-level news.
+
+The ids of the ``NEWS_TIMELINE_SIZE`` newest top-level news are kept as a
+Redis list, newest first. New news are pushed to its head when their
+transaction commits, so feed pages only read a slice of ids and load those
+rows with one ``IN`` query instead of sorting the news table. Pushes and
+removals are single atomic list operations, so concurrent posts never
+have to drop the list.
+
+The database stays the source of truth: a missing list is rebuilt from it
+on the next read, and the list expires ``NEWS_TIMELINE_TIMEOUT`` seconds
+after it was loaded, however many updates it received meanwhile, so an
+update missed by the cache is not served for longer.
+"""
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+KEY = "news:timeline"
+
+
+def rebuild():
+    """Reloads the timeline from the database and returns its ids."""
+    from src.news.models import News
+
+    ids = [
+        str(pk) for pk in
+        News.objects.filter(reply=False)
+        .order_by("-timestamp", "-pk")
+        .values_list("pk", flat=True)[:settings.NEWS_TIMELINE_SIZE]
+    ]
+    pipeline = get_redis_connection().pipeline()
+    pipeline.delete(KEY)
+
+    if ids:
+        pipeline.rpush(KEY, *ids)
+        pipeline.expire(KEY, settings.NEWS_TIMELINE_TIMEOUT)
+
+    pipeline.execute()
+    return ids
+
+
+def get_ids():
+    ids = get_redis_connection().lrange(KEY, 0, -1)
+    return [news_id.decode() for news_id in ids] if ids else rebuild()
+
+
+def push(news):
+    """Moves ``news`` to the head of the timeline. A missing timeline is
+    left for the next read to rebuild, and keeps its expiry otherwise."""
+    news_id = str(news.pk)
+    pipeline = get_redis_connection().pipeline()
+    pipeline.lrem(KEY, 0, news_id)
+    pipeline.lpushx(KEY, news_id)
+    pipeline.ltrim(KEY, 0, settings.NEWS_TIMELINE_SIZE - 1)
+    pipeline.execute()
+
+
+def remove(news_id):
+    get_redis_connection().lrem(KEY, 0, str(news_id))
+
+
+class Timeline:
+    """Sequence of the feed of ``user`` for ``Paginator`` and ``ListView``.
+    Slices inside the cached timeline are loaded by id, deeper pages fall
+    back to the database."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.ids = get_ids()
+
+    def is_complete(self):
+        """Whether the cached ids are every top-level news."""
+        return len(self.ids) < settings.NEWS_TIMELINE_SIZE
+
+    def get_queryset(self):
+        from src.news.models import News
+
+        return News.objects.feed(self.user).order_by("-timestamp", "-pk")
+
+    def count(self):
+        if self.is_complete():
+            return len(self.ids)
+
+        return self.get_queryset().count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start, stop = index.start or 0, index.stop
+
+        if not self.is_complete() and (stop is None or stop > len(self.ids)):
+            return list(self.get_queryset()[index])
+
+        ids = self.ids[start:stop]
+        news = self.get_queryset().in_bulk(ids)
+        return [news[pk] for pk in map(self.to_pk, ids) if pk in news]
+
+    @staticmethod
+    def to_pk(news_id):
+        from src.news.models import News
+
+        return News._meta.pk.to_python(news_id)
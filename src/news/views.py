@@ -1,22 +1,43 @@
+import hashlib
+import json
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
 from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, quote_etag
 from django.views.decorators.http import require_http_methods
 from django.views.generic import ListView, DeleteView
 
 from src.decorators import ajax_required
 from src.mixins import AuthorRequiredMixin
 from src.news.models import News
+from src.news.timeline import Timeline
+from src.pagination import encode_cursor, keyset_page
 
 
 class NewsListView(LoginRequiredMixin, ListView):
+    """Renders the first page of the feed from the cached timeline, the
+    following ones are loaded through ``news_page`` while scrolling."""
+
     model = News
-    paginate_by = 15
+    context_object_name = "news_list"
+    template_name = "news/news_list.html"
 
     def get_queryset(self, **kwargs):
-        return News.objects.filter(reply=False)
+        return Timeline(self.request.user)[:settings.NEWS_PAGE_SIZE]
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        news_list = context["news_list"]
+        context["next_cursor"] = (
+            encode_cursor(news_list[-1].timestamp, news_list[-1].pk)
+            if len(news_list) == settings.NEWS_PAGE_SIZE else None
+        )
+        return context
 
 
 class NewsDeleteView(LoginRequiredMixin, AuthorRequiredMixin, DeleteView):
@@ -24,6 +45,34 @@ class NewsDeleteView(LoginRequiredMixin, AuthorRequiredMixin, DeleteView):
     success_url = reverse_lazy("news:list")
 
 
+@login_required
+@ajax_required
+@require_http_methods(["GET"])
+def news_page(request):
+    """AJAX functional view returning the page of the feed following the
+    ``cursor``, rendered and as ids. Pages are read with a keyset query on
+    ``(timestamp, uuid_id)``, so deep pages cost the same as the first one
+    and posts published meanwhile do not shift them."""
+    try:
+        news_list, next_cursor = keyset_page(
+            News.objects.feed(request.user),
+            request.GET.get("cursor"),
+            size=settings.NEWS_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    html = "".join(
+        render_to_string("news/news_single.html", {"news": news, "request": request})
+        for news in news_list
+    )
+    return JsonResponse({
+        "html": html,
+        "news": [str(news.pk) for news in news_list],
+        "next_cursor": next_cursor,
+    })
+
+
 @login_required
 @ajax_required
 @require_http_methods(["POST"])
@@ -51,9 +100,8 @@ def like(request):
     user = request.user
 
     news = News.objects.get(pk=news_id)
-    news.switch_like(user)
 
-    return JsonResponse({"likes": news.count_likers()})
+    return JsonResponse({"likes": news.switch_like(user)})
 
 
 @login_required
@@ -99,3 +147,28 @@ def update_interactions(request):
     news = News.objects.get(pk=data_point)
     data = {"likes": news.count_likers(), "comments": news.count_thread()}
     return JsonResponse(data)
+
+
+@login_required
+@ajax_required
+@require_http_methods(["GET"])
+def interactions(request):
+    """AJAX functional view returning the like and comment counts of every
+    ``id_value`` at once, to refresh all the visible news with one request.
+    Responses carry an ETag, so unchanged counts are answered with an empty
+    304."""
+    ids = request.GET.getlist("id_value")
+
+    if not 0 < len(ids) <= settings.NEWS_INTERACTIONS_LIMIT:
+        return HttpResponseBadRequest()
+
+    try:
+        ids = [News._meta.pk.to_python(news_id) for news_id in ids]
+    except ValidationError:
+        return HttpResponseBadRequest()
+
+    data = News.objects.interactions(ids)
+    etag = quote_etag(hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag) or JsonResponse(data)
+    response["ETag"] = etag
+    return response
@@ -1,25 +1,113 @@
 import json
+from urllib.parse import parse_qs
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from src.notifications.models import Notification
+from src.users.presence import PresenceConsumerMixin
 
-class NotificationsConsumer(AsyncWebsocketConsumer):
+GLOBAL_GROUP = "notifications"
+
+
+def user_group(user_id):
+    """Channel group holding every socket of a single user."""
+    return f"notifications-{user_id}"
+
+
+def parse_frame(text_data):
+    """Returns the JSON object sent by a client, or None."""
+    try:
+        frame = json.loads(text_data)
+    except ValueError:
+        return None
+
+    return frame if isinstance(frame, dict) else None
+
+
+def query_param(scope, name):
+    """Returns the value of ``name`` in the query string of the connection,
+    or an empty string."""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get(name, [""])[0]
+
+
+async def replay(consumer, get_missed):
+    """Sends the events a reconnecting socket missed since the ``since``
+    cursor of its query string, then a ``replay.done`` frame. The socket has
+    already joined its groups, so nothing sent meanwhile is lost, although
+    some events may arrive twice. ``truncated`` tells the client it is too
+    far behind and has to reload instead."""
+
+    since = query_param(consumer.scope, "since")
+
+    if not since:
+        return
+
+    try:
+        events, truncated = await database_sync_to_async(get_missed)(since)
+    except ValueError:
+        events, truncated = [], True
+
+    for event in events:
+        await consumer.send(text_data=json.dumps(event))
+
+    await consumer.send(text_data=json.dumps({"key": "replay.done", "truncated": truncated}))
+
+
+class NotificationsConsumer(PresenceConsumerMixin, AsyncWebsocketConsumer):
+    """Consumer delivering notifications. Every socket joins its user's own
+    group; site-wide events are only received by sockets connected with
+    ``?global=1``. Sockets reconnecting with ``?since=<cursor>`` first receive
+    the notifications they missed. The socket also keeps the user's presence
+    alive."""
 
     async def connect(self):
         if self.scope["user"].is_anonymous:
             await self.close()
         else:
-            await self.channel_layer.group_add(
-                "notifications",
-                self.channel_name,
-            )
+            self.notification_groups = [user_group(self.scope["user"].pk)]
+
+            if self.wants_global_events():
+                self.notification_groups.append(GLOBAL_GROUP)
+
+            for group in self.notification_groups:
+                await self.channel_layer.group_add(group, self.channel_name)
+
             await self.accept()
+            await replay(self, self.get_missed)
+            await self.presence_connect()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            "notifications",
-            self.channel_name,
-        )
+        for group in getattr(self, "notification_groups", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+        await self.presence_disconnect()
 
     async def receive(self, text_data):
+        if isinstance(text_data, str):
+            frame = parse_frame(text_data)
+
+            if frame is not None and await self.receive_presence_frame(frame):
+                return
+
         await self.send(text_data=json.dumps(text_data))
+
+    def wants_global_events(self):
+        return query_param(self.scope, "global").lower() in ("1", "true")
+
+    def get_missed(self, since):
+        user = self.scope["user"]
+        notifications, truncated = Notification.objects.get_missed(user, since)
+        events = [
+            {
+                "type": "receive",
+                "key": "notification",
+                "actor_name": notification.actor.username,
+                "id_value": None,
+                "recipient": user.username,
+                "notification": notification.serialize(),
+            }
+            for notification in notifications
+        ]
+        return events, truncated
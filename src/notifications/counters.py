@@ -0,0 +1,105 @@
+"""Per-user unread notification counters kept in the cache backend.
+
+Counters are updated with atomic ``incr``/``decr`` calls when notifications
+are created or marked, and rebuilt from the database on a cache miss.
+A generation number in every key lets bulk updates touching an unknown set
+of recipients invalidate all counters at once.
+
+Updates are applied when the current transaction commits: a rolled back
+write leaves the counters alone, and a counter rebuilt by a concurrent read
+before the commit is corrected once the rows are visible.
+
+Notifications are created by the task worker while counts are read by the
+web processes, so counters are only used with a cache shared by every
+process. A process-local cache falls back to counting in the database.
+"""
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+GENERATION_KEY = "notifications:unread:generation"
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def _key(user_id, generation):
+    return f"notifications:unread:{generation}:{user_id}"
+
+
+def is_shared():
+    """Whether the default cache is seen by every process."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def get_unread_count(user):
+    from src.notifications.models import Notification
+
+    if not is_shared():
+        return Notification.objects.filter(recipient=user).unread().count()
+
+    key = _key(user.pk, _generation())
+    count = cache.get(key)
+
+    if count is None:
+        count = Notification.objects.filter(recipient=user).unread().count()
+        # ``add`` keeps a value a concurrent write may have stored meanwhile.
+        cache.add(key, count, settings.NOTIFICATIONS_UNREAD_COUNT_TIMEOUT)
+
+    return count
+
+
+def increment(user_ids, delta=1):
+    """Adds ``delta`` to the counters of ``user_ids``. Missing counters are
+    left alone and rebuilt from the database on the next read."""
+
+    if not delta:
+        return
+
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _increment(user_ids, delta))
+
+
+def _increment(user_ids, delta):
+    generation = _generation()
+
+    for user_id in user_ids:
+        key = _key(user_id, generation)
+
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+
+
+def decrement(user_ids, delta=1):
+    increment(user_ids, -delta)
+
+
+def invalidate(user_ids):
+    """Drops the counters of ``user_ids`` with a single cache call, cheaper
+    than one ``incr`` per user for large batches."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _invalidate(user_ids))
+
+
+def _invalidate(user_ids):
+    if user_ids:
+        generation = _generation()
+        cache.delete_many([_key(user_id, generation) for user_id in user_ids])
+
+
+def invalidate_all():
+    transaction.on_commit(_invalidate_all)
+
+
+def _invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from src.notifications import counters
+from src.notifications.models import Notification
+
+GROUP_FIELDS = (
+    "recipient",
+    "verb",
+    "action_object_content_type",
+    "action_object_object_id",
+    "unread",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges existing notifications with the same recipient, verb and "
+        "action object that happened inside the coalescing window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window", type=int, default=settings.NOTIFICATIONS_COALESCE_WINDOW,
+            help="Maximum seconds between two merged notifications.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report how many rows would be removed.",
+        )
+
+    def handle(self, *args, **options):
+        window = timedelta(seconds=options["window"])
+        groups = (
+            Notification.objects.filter(
+                verb__in=settings.NOTIFICATIONS_COALESCE_VERBS,
+                action_object_object_id__isnull=False,
+            )
+            .values(*GROUP_FIELDS)
+            .annotate(total=Count("pk"))
+            .filter(total__gt=1)
+            .order_by()
+        )
+
+        removed = 0
+        recipients = set()
+
+        for group in groups.iterator():
+            group.pop("total")
+            merged = self.compact(group, window, options["dry_run"])
+
+            if merged and group["unread"]:
+                recipients.add(group["recipient"])
+
+            removed += merged
+
+        counters.invalidate(recipients)
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(f"{verb} {removed} notifications.")
+
+    def compact(self, group, window, dry_run):
+        """Merges each run of notifications closer than ``window`` into its
+        newest row. Returns the number of removed rows."""
+
+        removed = 0
+
+        with transaction.atomic():
+            rows = list(
+                Notification.objects.filter(**group)
+                .select_related("actor")
+                .select_for_update(of=("self",))
+                .order_by("-timestamp")
+            )
+
+            if not rows:
+                return 0
+
+            cluster = [rows[0]]
+
+            for row in rows[1:] + [None]:
+                if row is not None and cluster[-1].timestamp - row.timestamp <= window:
+                    cluster.append(row)
+                    continue
+
+                if len(cluster) > 1:
+                    removed += len(cluster) - 1
+
+                    if not dry_run:
+                        cluster[0].absorb(cluster[1:])
+
+                cluster = [row]
+
+        return removed
@@ -0,0 +1,113 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from src.notifications.models import Notification
+
+
+def month_start(value, months=0):
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Manages monthly PostgreSQL range partitions of the notifications "
+        "table on timestamp. Run with --convert once, during a maintenance "
+        "window, then regularly to create the partitions of coming months."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert", action="store_true",
+            help="Turn the existing table into a partitioned one, copying every row.",
+        )
+        parser.add_argument(
+            "--months-ahead", type=int, default=3,
+            help="Number of future monthly partitions to make sure exist.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning is only supported on PostgreSQL.")
+
+        self.table = Notification._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            partitioned = self.is_partitioned(cursor)
+
+            if options["convert"] and not partitioned:
+                self.convert(cursor, options["months_ahead"])
+            elif not partitioned:
+                raise CommandError(f"{self.table} is not partitioned, run with --convert first.")
+            else:
+                self.create_partitions(cursor, timezone.now().date(), options["months_ahead"])
+
+    def is_partitioned(self, cursor):
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [self.table])
+        return cursor.fetchone()[0] == "p"
+
+    def create_partitions(self, cursor, first_day, months_ahead):
+        start = month_start(first_day)
+        end = month_start(timezone.now().date(), months_ahead + 1)
+        qn = connection.ops.quote_name
+
+        while start < end:
+            following = month_start(start, 1)
+            name = f"{self.table}_y{start.year}m{start.month:02d}"
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(self.table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, following],
+            )
+            start = following
+
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(self.table + '_default')} "
+            f"PARTITION OF {qn(self.table)} DEFAULT"
+        )
+
+    def convert(self, cursor, months_ahead):
+        """Recreates the table partitioned by timestamp. PostgreSQL requires
+        the partition key in the primary key, so it becomes
+        (uuid_id, timestamp); indexes and constraints are recreated under
+        their original names so later migrations keep working."""
+
+        qn = connection.ops.quote_name
+        old = f"{self.table}_unpartitioned"
+
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [self.table, f"{self.table}_pkey"],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('c', 'f')",
+            [self.table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({qn('timestamp')}) FROM {qn(self.table)}")
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        self.stdout.write(f"Converting {self.table}, this locks the table until the copy ends.")
+
+        cursor.execute(f"ALTER TABLE {qn(self.table)} RENAME TO {qn(old)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(self.table)} (LIKE {qn(old)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({qn('timestamp')})"
+        )
+        cursor.execute(f"ALTER TABLE {qn(self.table)} ADD PRIMARY KEY (uuid_id, {qn('timestamp')})")
+        self.create_partitions(cursor, oldest.date(), months_ahead)
+        cursor.execute(f"INSERT INTO {qn(self.table)} SELECT * FROM {qn(old)}")
+        cursor.execute(f"DROP TABLE {qn(old)}")
+
+        for definition in indexes:
+            cursor.execute(definition)
+
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {qn(self.table)} ADD CONSTRAINT {qn(name)} {definition}")
+
+        self.stdout.write(f"{self.table} is now partitioned by month.")
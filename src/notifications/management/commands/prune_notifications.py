@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.notifications import counters
+from src.notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes notifications past their retention period in small batches, "
+        "so no lock is held for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Seconds to wait between batches to let other writes through.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report how many rows would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        expired = Notification.objects.expired()
+
+        if options["dry_run"]:
+            self.stdout.write(f"Would delete {expired.count()} notifications.")
+            return
+
+        deleted = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    expired.order_by().values_list("pk", "recipient_id", "unread")[:options["batch_size"]]
+                )
+
+                if not batch:
+                    break
+
+                Notification.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+
+            counters.invalidate({recipient for _, recipient, unread in batch if unread})
+            deleted += len(batch)
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(f"Deleted {deleted} notifications.")
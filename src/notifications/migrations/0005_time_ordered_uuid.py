@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import src.identifiers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_replay_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='uuid_id',
+            field=models.UUIDField(default=src.identifiers.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_time_ordered_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['unread', 'timestamp'], name='notifications_read_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['verb', 'timestamp'], name='notifications_verb_expiry_idx'),
+        ),
+    ]
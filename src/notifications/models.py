@@ -1,14 +1,24 @@
-import uuid
+from datetime import timedelta
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 from slugify import slugify
 
+from src.identifiers import uuid7
+from src.notifications import counters
+from src.pagination import encode_cursor, keyset_page
+from src.tasks.queue import enqueue
+
+
+def notification_slug(recipient, uuid_id, verb):
+    """Builds the slug used to address a single notification."""
+    return slugify(f"{recipient} {uuid_id} {verb}", lowercase=True, max_length=200)
+
 
 class NotificationQuerySet(models.query.QuerySet):
     def unread(self):
@@ -23,7 +33,14 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qs = qs.filter(recipient=recipient)
 
-        return qs.update(unread=False)
+        updated = qs.update(unread=False)
+
+        if recipient:
+            counters.decrement([recipient.pk], updated)
+        elif updated:
+            counters.invalidate_all()
+
+        return updated
 
     def mark_all_as_unread(self, recipient=None):
         qs = self.read()
@@ -31,11 +48,140 @@ class NotificationQuerySet(models.query.QuerySet):
         if recipient:
             qs = qs.filter(recipient=recipient)
 
-        return qs.update(unread=True)
+        updated = qs.update(unread=True)
+
+        if recipient:
+            counters.increment([recipient.pk], updated)
+        elif updated:
+            counters.invalidate_all()
+
+        return updated
 
     def get_most_recent(self):
         return self.unread()[:5]
 
+    def expired(self, now=None):
+        """Notifications past their retention period: read ones after
+        ``NOTIFICATIONS_READ_RETENTION`` seconds and any notification whose
+        verb has a shorter period in ``NOTIFICATIONS_RETENTION``."""
+
+        now = now or timezone.now()
+        condition = Q(
+            unread=False,
+            timestamp__lt=now - timedelta(seconds=settings.NOTIFICATIONS_READ_RETENTION),
+        )
+
+        for verb, seconds in settings.NOTIFICATIONS_RETENTION.items():
+            condition |= Q(verb=verb, timestamp__lt=now - timedelta(seconds=seconds))
+
+        return self.filter(condition)
+
+    def with_related(self):
+        """Loads actors, recipients and action objects together with the
+        notifications: action objects are fetched with one query per content
+        type instead of one query per row."""
+        return self.select_related(
+            "actor",
+            "recipient",
+            "action_object_content_type",
+        ).prefetch_related("action_object")
+
+    def get_missed(self, user, since, size=None):
+        """Returns the notifications of ``user`` created or updated after the
+        ``since`` cursor, oldest first, and whether more are left beyond
+        ``size``."""
+        notifications, cursor = keyset_page(
+            self.filter(recipient=user).with_related(),
+            cursor=since,
+            size=size or settings.NOTIFICATIONS_REPLAY_LIMIT,
+            descending=False,
+        )
+        return notifications, cursor is not None
+
+    def notify(self, actor, recipient, verb, action_object=None):
+        """Creates a notification, or merges it into an unread one with the
+        same recipient, verb and action object touched inside the coalescing
+        window. Returns the notification and whether it was created."""
+
+        if action_object is None or verb not in settings.NOTIFICATIONS_COALESCE_VERBS:
+            return self.create(
+                actor=actor,
+                recipient=recipient,
+                verb=verb,
+                action_object=action_object,
+            ), True
+
+        window = timezone.now() - timedelta(seconds=settings.NOTIFICATIONS_COALESCE_WINDOW)
+
+        with transaction.atomic():
+            existing = (
+                self.unread()
+                .select_for_update(of=("self",))
+                .select_related("actor")
+                .filter(
+                    recipient=recipient,
+                    verb=verb,
+                    action_object_content_type=ContentType.objects.get_for_model(action_object),
+                    action_object_object_id=str(action_object.pk),
+                    timestamp__gte=window,
+                )
+                .order_by("-timestamp")
+                .first()
+            )
+
+            if existing is None:
+                return self.create(
+                    actor=actor,
+                    recipient=recipient,
+                    verb=verb,
+                    action_object=action_object,
+                ), True
+
+            existing.add_actor(actor)
+
+        return existing, False
+
+    def bulk_notify(self, actor, recipients, verb, action_object=None, batch_size=None):
+        """Creates one notification per recipient with batched INSERTs instead
+        of a query per user. Slugs are computed up front because
+        ``bulk_create`` bypasses ``save()``. Returns the number of created rows."""
+
+        batch_size = batch_size or settings.NOTIFICATIONS_BATCH_SIZE
+        content_type = object_id = None
+
+        if action_object is not None:
+            content_type = ContentType.objects.get_for_model(action_object)
+            object_id = str(action_object.pk)
+
+        recipient_ids = []
+        batch = []
+
+        for recipient in recipients:
+            uuid_id = uuid7()
+            batch.append(
+                self.model(
+                    uuid_id=uuid_id,
+                    actor=actor,
+                    recipient=recipient,
+                    verb=verb,
+                    slug=notification_slug(recipient.username, uuid_id, verb),
+                    action_object_content_type=content_type,
+                    action_object_object_id=object_id,
+                )
+            )
+
+            if len(batch) >= batch_size:
+                self.bulk_create(batch, batch_size=batch_size)
+                recipient_ids += [notification.recipient_id for notification in batch]
+                batch = []
+
+        if batch:
+            self.bulk_create(batch, batch_size=batch_size)
+            recipient_ids += [notification.recipient_id for notification in batch]
+
+        counters.invalidate(recipient_ids)
+        return len(recipient_ids)
+
 
 class Notification(models.Model):
     LIKED = "L"
@@ -69,7 +215,7 @@ class Notification(models.Model):
 
     objects = NotificationQuerySet.as_manager()
 
-    uuid_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uuid_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name="notify_actor",
@@ -96,29 +242,98 @@ class Notification(models.Model):
         "action_object_content_type",
         "action_object_object_id",
     )
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ("-timestamp",)
+        indexes = [
+            models.Index(
+                fields=["recipient", "unread", "-timestamp"],
+                name="notifications_inbox_idx",
+            ),
+            models.Index(
+                fields=["recipient", "timestamp"],
+                name="notifications_replay_idx",
+            ),
+            # Both halves of the ``expired()`` predicate, combined by the
+            # planner with a bitmap OR.
+            models.Index(
+                fields=["unread", "timestamp"],
+                name="notifications_read_expiry_idx",
+            ),
+            models.Index(
+                fields=["verb", "timestamp"],
+                name="notifications_verb_expiry_idx",
+            ),
+        ]
 
     def __str__(self):
         if self.action_object:
-            return f"{self.actor} {self.get_verb_display()} {self.action_object} {self.time_since()} ago"
+            return f"{self.get_actors_display()} {self.get_verb_display()} {self.action_object} {self.time_since()} ago"
 
-        return f"{self.actor} {self.get_verb_display()} {self.time_since()} ago"
+        return f"{self.get_actors_display()} {self.get_verb_display()} {self.time_since()} ago"
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(
-                f"{self.recipient} {self.uuid_id} {self.verb}",
-                lowercase=True,
-                max_length=200,
-            )
+            self.slug = notification_slug(self.recipient, self.uuid_id, self.verb)
 
+        adding = self._state.adding
         super().save(*args, **kwargs)
 
+        if adding and self.unread:
+            counters.increment([self.recipient_id])
+
+    def get_actors_display(self):
+        if self.actor_count > 1:
+            others = self.actor_count - 1
+            return f"{self.actor} and {others} {'other' if others == 1 else 'others'}"
+
+        return str(self.actor)
+
+    def get_sample_actors(self):
+        """Usernames of the most recent actors, newest first."""
+        return self.sample_actors or [self.actor.username]
+
+    def add_actor(self, actor):
+        """Merges another actor into this notification. A repeated actor is
+        only recognised while it is still among the sampled ones."""
+
+        samples = self.get_sample_actors()
+
+        if actor.username not in samples:
+            self.actor_count += 1
+
+        samples = [actor.username] + [name for name in samples if name != actor.username]
+
+        self.actor = actor
+        self.sample_actors = samples[:settings.NOTIFICATIONS_SAMPLE_ACTORS]
+        self.timestamp = timezone.now()
+        self.save(update_fields=["actor", "actor_count", "sample_actors", "timestamp"])
+
+    def absorb(self, others):
+        """Merges older notifications for the same target into this one and
+        deletes them."""
+
+        samples = self.get_sample_actors()
+        seen = set(samples)
+
+        for other in others:
+            other_samples = other.get_sample_actors()
+            # The newest actor of ``other`` may already be counted here.
+            duplicate = 1 if other_samples[0] in seen else 0
+
+            self.actor_count += other.actor_count - duplicate
+            samples += [name for name in other_samples if name not in seen]
+            seen.update(other_samples)
+
+        self.sample_actors = samples[:settings.NOTIFICATIONS_SAMPLE_ACTORS]
+        self.save(update_fields=["actor_count", "sample_actors"])
+        Notification.objects.filter(pk__in=[other.pk for other in others]).delete()
+
     def time_since(self, now=None):
         from django.utils.timesince import timesince
 
@@ -152,15 +367,29 @@ class Notification(models.Model):
         elif self.verb == "R":
             return "fa-reply"
 
+    def serialize(self):
+        return {
+            "slug": self.slug,
+            "actor": self.actor.username,
+            "verb": self.get_verb_display(),
+            "text": str(self),
+            "icon": self.get_icon(),
+            "unread": self.unread,
+            "timestamp": self.timestamp.isoformat(),
+            "cursor": encode_cursor(self.timestamp, self.pk),
+        }
+
     def mark_as_read(self):
         if self.unread:
             self.unread = False
             self.save()
+            counters.decrement([self.recipient_id])
 
     def mark_as_unread(self):
         if not self.unread:
             self.unread = True
             self.save()
+            counters.increment([self.recipient_id])
 
 
 def notification_handler(
@@ -170,56 +399,55 @@ def notification_handler(
         key="notification",
         id_value=None,
         action_object=None,
+        batch_size=None,
 ):
-    """Handler function to create a Notification instance."""
+    """Handler function to schedule the creation of Notification instances.
+    Only a small task record is written on the request path, the fan-out
+    itself runs in ``src.notifications.tasks.fan_out_notifications``. Global
+    and list recipients are written with batched INSERTs of ``batch_size``
+    rows, which defaults to ``settings.NOTIFICATIONS_BATCH_SIZE``."""
 
     if recipient == "global":
-        users = get_user_model().objects.all().exclude(username=actor.username)
-
-        for user in users:
-            Notification.objects.create(
-                actor=actor,
-                recipient=user,
-                verb=verb,
-                action_object=action_object,
-            )
-        notification_broadcast(actor, key)
+        pass
 
     elif isinstance(recipient, list):
-        for user in recipient:
-            Notification.objects.create(
-                actor=actor,
-                recipient=get_user_model().objects.get(username=user),
-                verb=verb,
-                action_object=action_object,
-            )
+        recipient = [str(user) for user in recipient]
 
     elif isinstance(recipient, get_user_model()):
-        Notification.objects.create(
-            actor=actor,
-            recipient=recipient,
-            verb=verb,
-            action_object=action_object,
-        )
-        notification_broadcast(
-            actor,
-            key,
-            id_value=id_value,
-            recipient=recipient.username,
+        recipient = recipient.pk
+
+    else:
+        return
+
+    if action_object is not None:
+        action_object = (
+            ContentType.objects.get_for_model(action_object).pk,
+            str(action_object.pk),
         )
 
+    enqueue(
+        "notifications.fan_out",
+        actor_id=actor.pk,
+        recipient=recipient,
+        verb=verb,
+        key=key,
+        id_value=id_value,
+        action_object=action_object,
+        batch_size=batch_size,
+    )
+
 
 def notification_broadcast(actor, key, id_value=None, recipient=None):
-    """Notification handler to broadcast calls to
-    the reception layer of the WebSocket consumer of this app."""
-
-    channel_layer = get_channel_layer()
-
-    payload = {
-        "type": "receive",
-        "key": key,
-        "actor_name": actor.username,
-        "id_value": id_value,
-        "recipient": recipient,
-    }
-    async_to_sync(channel_layer.group_send)("notifications", payload)
+    """Notification handler to schedule a broadcast to
+    the reception layer of the WebSocket consumer of this app. With a
+    ``recipient`` user only their sockets receive it, otherwise it goes
+    to every socket subscribed to site-wide events."""
+
+    enqueue(
+        "notifications.broadcast",
+        actor_name=actor.username,
+        key=key,
+        id_value=id_value,
+        recipient=recipient.username if recipient else None,
+        recipient_id=recipient.pk if recipient else None,
+    )
@@ -0,0 +1,119 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from src.notifications.consumers import GLOBAL_GROUP, user_group
+from src.notifications.models import Notification
+from src.tasks.queue import enqueue, task
+
+
+@task("notifications.fan_out")
+def fan_out_notifications(
+        actor_id,
+        recipient,
+        verb,
+        key="notification",
+        id_value=None,
+        action_object=None,
+        batch_size=None,
+):
+    """Creates the notifications scheduled by ``notification_handler``.
+    ``recipient`` is either ``"global"``, a list of usernames or a user pk.
+
+    The rows and the broadcast task are written in one transaction, so a
+    failing broadcast is retried on its own instead of re-running the
+    inserts and duplicating them."""
+
+    actor = get_user_model().objects.filter(pk=actor_id).first()
+
+    if actor is None:
+        return
+
+    if action_object is not None:
+        content_type_id, object_id = action_object
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        action_object = model._base_manager.filter(pk=object_id).first()
+
+        # The object was deleted before the task ran.
+        if action_object is None:
+            return
+
+    with transaction.atomic():
+        if recipient == "global":
+            users = (
+                get_user_model()
+                .objects.exclude(username=actor.username)
+                .only("id", "username")
+            )
+            batch_size = batch_size or settings.NOTIFICATIONS_BATCH_SIZE
+
+            Notification.objects.bulk_notify(
+                actor,
+                users.iterator(chunk_size=batch_size),
+                verb,
+                action_object=action_object,
+                batch_size=batch_size,
+            )
+            enqueue("notifications.broadcast", actor_name=actor.username, key=key)
+
+        elif isinstance(recipient, list):
+            users = get_user_model().objects.filter(username__in=recipient).only("id", "username")
+
+            Notification.objects.bulk_notify(
+                actor,
+                users,
+                verb,
+                action_object=action_object,
+                batch_size=batch_size,
+            )
+
+        else:
+            user = get_user_model().objects.filter(pk=recipient).first()
+
+            if user is None:
+                return
+
+            notification, _ = Notification.objects.notify(actor, user, verb, action_object=action_object)
+            enqueue(
+                "notifications.broadcast",
+                actor_name=actor.username,
+                key=key,
+                id_value=id_value,
+                recipient=user.username,
+                recipient_id=user.pk,
+                notification=notification.serialize() if settings.NOTIFICATIONS_RENDERED_PAYLOADS else None,
+            )
+
+
+@task("notifications.broadcast")
+def broadcast_notification(
+        actor_name,
+        key,
+        id_value=None,
+        recipient=None,
+        recipient_id=None,
+        notification=None,
+):
+    """Broadcasts calls to the reception layer of the WebSocket consumer
+    of this app. Events with a ``recipient_id`` only reach that user's
+    sockets, the rest go to the opt-in global group. A serialized
+    ``notification`` lets clients show it without fetching it."""
+
+    channel_layer = get_channel_layer()
+
+    payload = {
+        "type": "receive",
+        "key": key,
+        "actor_name": actor_name,
+        "id_value": id_value,
+        "recipient": recipient,
+    }
+
+    if notification is not None:
+        payload["notification"] = notification
+
+    group = user_group(recipient_id) if recipient_id else GLOBAL_GROUP
+    async_to_sync(channel_layer.group_send)(group, payload)
@@ -0,0 +1,178 @@
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from test_plus.test import TestCase
+
+from src.news.models import News
+from src.notifications.consumers import NotificationsConsumer
+from src.notifications.models import Notification, notification_handler
+from src.notifications.tasks import broadcast_notification
+from src.pagination import encode_cursor
+
+
+async def connect(user, query_string=b""):
+    communicator = ApplicationCommunicator(
+        NotificationsConsumer.as_asgi(),
+        {
+            "type": "websocket",
+            "path": "/notifications/",
+            "query_string": query_string,
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+        },
+    )
+    await communicator.send_input({"type": "websocket.connect"})
+    response = await communicator.receive_output()
+    assert response["type"] == "websocket.accept"
+    return communicator
+
+
+async def disconnect(*communicators):
+    for communicator in communicators:
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait()
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationsConsumerTest(TestCase):
+    def setUp(self):
+        self.user = self.make_user("first_user")
+        self.other_user = self.make_user("second_user")
+
+    def test_targeted_event_reaches_only_recipient(self):
+        async def scenario():
+            recipient = await connect(self.other_user)
+            bystander = await connect(self.user, b"global=1")
+
+            await sync_to_async(broadcast_notification)(
+                "first_user",
+                "notification",
+                recipient="second_user",
+                recipient_id=self.other_user.pk,
+            )
+
+            event = json.loads((await recipient.receive_output())["text"])
+            assert event["recipient"] == "second_user"
+            assert await bystander.receive_nothing()
+
+            await disconnect(recipient, bystander)
+
+        async_to_sync(scenario)()
+
+    def test_global_event_is_opt_in(self):
+        async def scenario():
+            subscribed = await connect(self.user, b"global=1")
+            unsubscribed = await connect(self.other_user)
+
+            await sync_to_async(broadcast_notification)("first_user", "additional_news")
+
+            event = json.loads((await subscribed.receive_output())["text"])
+            assert event["key"] == "additional_news"
+            assert await unsubscribed.receive_nothing()
+
+            await disconnect(subscribed, unsubscribed)
+
+        async_to_sync(scenario)()
+
+    def test_event_carries_serialized_notification(self):
+        news = News.objects.create(user=self.other_user, content="Some news")
+
+        async def scenario():
+            recipient = await connect(self.other_user)
+
+            await sync_to_async(notification_handler)(
+                self.user, self.other_user, "L", action_object=news,
+            )
+
+            event = json.loads((await recipient.receive_output())["text"])
+            assert event["notification"]["actor"] == "first_user"
+            assert event["notification"]["text"].startswith("first_user liked Some news")
+
+            await disconnect(recipient)
+
+        async_to_sync(scenario)()
+
+    def test_presence_deltas_reach_watchers(self):
+        async def scenario():
+            watcher = await connect(self.user)
+            await watcher.send_input({
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "presence.watch", "users": ["second_user"]}),
+            })
+            snapshot = json.loads((await watcher.receive_output())["text"])
+            assert snapshot == {"key": "presence", "users": {"second_user": False}}
+
+            watched = await connect(self.other_user)
+            delta = json.loads((await watcher.receive_output())["text"])
+            assert delta["users"] == {"second_user": True}
+
+            await watched.send_input({"type": "websocket.receive", "text": json.dumps({"type": "heartbeat"})})
+            assert await watched.receive_nothing()
+
+            await disconnect(watched)
+            delta = json.loads((await watcher.receive_output())["text"])
+            assert delta["users"] == {"second_user": False}
+
+            await disconnect(watcher)
+
+        async_to_sync(scenario)()
+
+        assert not Notification.objects.exists()
+
+
+# The replay reaches the database from a worker thread through
+# database_sync_to_async, so the rows have to be committed.
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationsReplayTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("first_user", password="password")
+        self.other_user = get_user_model().objects.create_user("second_user", password="password")
+
+    def test_reconnect_replays_missed_notifications(self):
+        news = News.objects.create(user=self.user, content="Some news")
+        seen = Notification.objects.create(actor=self.other_user, recipient=self.user, verb="L")
+        Notification.objects.create(actor=self.other_user, recipient=self.user, verb="C", action_object=news)
+        Notification.objects.create(actor=self.user, recipient=self.other_user, verb="L")
+        since = encode_cursor(seen.timestamp, seen.pk).encode()
+
+        async def scenario():
+            recipient = await connect(self.user, b"since=" + since)
+
+            event = json.loads((await recipient.receive_output())["text"])
+            assert event["key"] == "notification"
+            assert event["notification"]["text"].startswith("second_user commented Some news")
+
+            done = json.loads((await recipient.receive_output())["text"])
+            assert done == {"key": "replay.done", "truncated": False}
+
+            await disconnect(recipient)
+
+        async_to_sync(scenario)()
+
+    def test_reconnect_with_tampered_cursor(self):
+        since = encode_cursor(timezone.now(), "not-a-pk").encode()
+
+        async def scenario():
+            recipient = await connect(self.user, b"since=" + since)
+
+            done = json.loads((await recipient.receive_output())["text"])
+            assert done == {"key": "replay.done", "truncated": True}
+
+            await disconnect(recipient)
+
+        async_to_sync(scenario)()
+
+    def test_connect_without_cursor_skips_replay(self):
+        Notification.objects.create(actor=self.other_user, recipient=self.user, verb="L")
+
+        async def scenario():
+            recipient = await connect(self.user)
+            assert await recipient.receive_nothing()
+            await disconnect(recipient)
+
+        async_to_sync(scenario)()
@@ -1,7 +1,18 @@
+from datetime import timedelta
+from io import StringIO
+
+from unittest import mock, skipIf, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.utils import timezone
 from test_plus.test import TestCase
 
 from src.news.models import News
+from src.notifications.counters import get_unread_count
 from src.notifications.models import Notification, notification_handler
+from src.questions.models import Question
+from src.tasks.models import Task
 
 
 class NotificationsModelsTest(TestCase):
@@ -101,6 +112,247 @@ class NotificationsModelsTest(TestCase):
         notification_handler(self.user, [self.user, self.other_user], "C")
         assert Notification.objects.unread().count() == 2
 
+    def test_global_notification_in_batches(self):
+        for i in range(5):
+            self.make_user(f"batch_user_{i}")
+
+        Notification.objects.mark_all_as_read()
+        notification_handler(self.user, "global", "I", batch_size=2)
+        created = Notification.objects.unread()
+
+        assert created.count() == 6
+        assert not created.filter(recipient=self.user).exists()
+        assert len({notification.slug for notification in created}) == 6
+
+    def test_list_notification_single_lookup(self):
+        Notification.objects.mark_all_as_read()
+
+        # The actor, the action object, every recipient and a batched INSERT,
+        # plus the savepoint of the fan-out transaction inside the test's one.
+        with self.assertNumQueries(6):
+            notification_handler(
+                self.user,
+                ["test_user", "other_test_user"],
+                "L",
+                action_object=self.first_news,
+            )
+
+        notification = Notification.objects.unread().get(recipient=self.other_user)
+        assert notification.action_object == self.first_news
+        assert notification.slug
+
+    def test_handler_defers_fan_out(self):
+        Notification.objects.mark_all_as_read()
+
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            notification_handler(self.user, self.other_user, "L", action_object=self.first_news)
+
+            assert Notification.objects.unread().count() == 0
+            assert Task.objects.get().name == "notifications.fan_out"
+
+            call_command("run_worker", once=True, stdout=StringIO())
+
+        assert Notification.objects.unread().get().action_object == self.first_news
+        assert not Task.objects.exists()
+
+    def test_failed_broadcast_keeps_notifications(self):
+        Notification.objects.mark_all_as_read()
+
+        with self.settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend"):
+            notification_handler(self.user, self.other_user, "L", action_object=self.first_news)
+
+            with mock.patch("src.notifications.tasks.get_channel_layer", side_effect=ConnectionError):
+                call_command("run_worker", once=True, stdout=StringIO(), stderr=StringIO())
+
+        assert Notification.objects.unread().count() == 1
+        task = Task.objects.get()
+        assert task.name == "notifications.broadcast"
+        assert task.attempts == 1
+
+    @mock.patch("src.notifications.counters.is_shared", return_value=True)
+    def test_unread_counter(self, is_shared):
+        assert get_unread_count(self.user) == 2
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(actor=self.other_user, recipient=self.user, verb="L")
+            self.third_notification.mark_as_read()
+
+        with self.assertNumQueries(0):
+            assert get_unread_count(self.user) == 2
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.third_notification.mark_as_unread()
+            Notification.objects.mark_all_as_read(self.user)
+
+        with self.assertNumQueries(0):
+            assert get_unread_count(self.user) == 0
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.mark_all_as_unread(self.user)
+
+        assert get_unread_count(self.user) == 3
+
+    @mock.patch("src.notifications.counters.is_shared", return_value=True)
+    def test_unread_counter_ignores_rolled_back_writes(self, is_shared):
+        assert get_unread_count(self.user) == 2
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Notification.objects.create(actor=self.other_user, recipient=self.user, verb="L")
+                raise RuntimeError
+
+        with self.assertNumQueries(0):
+            assert get_unread_count(self.user) == 2
+
+    @mock.patch("src.notifications.counters.is_shared", return_value=True)
+    def test_unread_counter_bulk_updates(self, is_shared):
+        assert get_unread_count(self.other_user) == 2
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_handler(self.user, "global", "I")
+
+        # Fanned out notifications drop the counters, rebuilt once.
+        with self.assertNumQueries(1):
+            assert get_unread_count(self.other_user) == 3
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.mark_all_as_read()
+
+        assert get_unread_count(self.other_user) == 0
+        assert get_unread_count(self.user) == 0
+
+    def test_unread_counter_needs_shared_cache(self):
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+        with self.settings(CACHES=locmem):
+            assert get_unread_count(self.other_user) == 2
+
+            with self.assertNumQueries(1):
+                assert get_unread_count(self.other_user) == 2
+
+    def test_notifications_are_coalesced(self):
+        third_user = self.make_user("third_test_user")
+
+        notification_handler(self.other_user, self.user, "L", action_object=self.first_news)
+        notification_handler(third_user, self.user, "L", action_object=self.first_news)
+        notification_handler(third_user, self.user, "L", action_object=self.first_news)
+
+        notification = Notification.objects.get(recipient=self.user, verb="L")
+
+        assert notification.actor == third_user
+        assert notification.actor_count == 2
+        assert notification.get_sample_actors() == ["third_test_user", "other_test_user"]
+
+        test_case = str(notification).replace("\xa0", " ")
+        assert test_case == "third_test_user and 1 other liked This is a short content. 0 minutes ago"
+
+    def test_coalescing_window_and_targets(self):
+        notification_handler(self.other_user, self.user, "L", action_object=self.first_news)
+        Notification.objects.filter(verb="L", recipient=self.user).update(
+            timestamp=timezone.now() - timedelta(days=1),
+        )
+
+        notification_handler(self.other_user, self.user, "L", action_object=self.first_news)
+        notification_handler(self.other_user, self.user, "L", action_object=self.second_news)
+        notification_handler(self.other_user, self.user, "W", action_object=self.first_news)
+        notification_handler(self.other_user, self.user, "W", action_object=self.first_news)
+
+        assert Notification.objects.filter(recipient=self.user, verb="L").count() == 3
+        assert Notification.objects.filter(recipient=self.user, verb="W").count() == 2
+
+    def test_compact_notifications(self):
+        third_user = self.make_user("third_test_user")
+
+        for actor in (self.other_user, third_user, self.other_user):
+            Notification.objects.create(
+                actor=actor, recipient=self.user, verb="L", action_object=self.first_news,
+            )
+
+        old = Notification.objects.create(
+            actor=third_user, recipient=self.user, verb="L", action_object=self.first_news,
+        )
+        Notification.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=1))
+
+        out = StringIO()
+        call_command("compact_notifications", stdout=out)
+
+        assert "Removed 2 notifications." in out.getvalue()
+
+        compacted = Notification.objects.filter(recipient=self.user, verb="L").order_by("-timestamp")
+        assert compacted.count() == 2
+        assert compacted[0].actor_count == 2
+        assert compacted[1].actor_count == 1
+        assert get_unread_count(self.user) == 4
+
+    def test_with_related_query_count(self):
+        question = Question.objects.create(user=self.user, title="A question", content="Why?")
+
+        def render_all():
+            # Notifications, then news and questions: one query per content type.
+            with self.assertNumQueries(3):
+                rendered = [str(notification) for notification in Notification.objects.with_related()]
+            return rendered
+
+        for target in (self.first_news, question):
+            Notification.objects.create(
+                actor=self.user, recipient=self.other_user, verb="W", action_object=target,
+            )
+
+        first = render_all()
+
+        for target in (self.second_news, question, self.first_news):
+            Notification.objects.create(
+                actor=self.other_user, recipient=self.user, verb="W", action_object=target,
+            )
+
+        second = render_all()
+
+        assert len(second) == len(first) + 3
+        assert any("A question" in text for text in second)
+        assert any("This is an answer to the first news." in text for text in second)
+
+    def test_prune_notifications(self):
+        long_ago = timezone.now() - timedelta(days=120)
+
+        login = Notification.objects.create(actor=self.user, recipient=self.other_user, verb="I")
+        old_read = Notification.objects.create(actor=self.user, recipient=self.other_user, verb="L")
+        old_unread = Notification.objects.create(actor=self.user, recipient=self.other_user, verb="L")
+        Notification.objects.filter(pk=login.pk).update(timestamp=timezone.now() - timedelta(days=2))
+        Notification.objects.filter(pk=old_read.pk).update(timestamp=long_ago, unread=False)
+        Notification.objects.filter(pk=old_unread.pk).update(timestamp=long_ago)
+        self.first_notification.mark_as_read()
+
+        assert set(Notification.objects.expired()) == {login, old_read}
+
+        out = StringIO()
+        call_command("prune_notifications", batch_size=1, stdout=out)
+
+        assert "Deleted 2 notifications." in out.getvalue()
+        assert Notification.objects.filter(pk=old_unread.pk).exists()
+        assert Notification.objects.filter(pk=self.first_notification.pk).exists()
+        assert get_unread_count(self.other_user) == 2
+
+    @skipIf(connection.vendor == "postgresql", "Partitioning is supported.")
+    def test_partition_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_notifications", convert=True, stdout=StringIO())
+
+    @skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL.")
+    def test_partition_notifications(self):
+        count = Notification.objects.count()
+        call_command("partition_notifications", convert=True, stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE relname = %s",
+                [Notification._meta.db_table],
+            )
+            assert cursor.fetchone()[0] == "p"
+
+        assert Notification.objects.count() == count
+        call_command("partition_notifications", months_ahead=6, stdout=StringIO())
+        Notification.objects.create(actor=self.user, recipient=self.other_user, verb="L")
+
     def test_icon_comment(self):
         notification_one = Notification.objects.create(
             actor=self.user,
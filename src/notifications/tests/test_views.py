@@ -1,8 +1,15 @@
+from unittest import mock
+
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from test_plus.test import TestCase
 
+from src.news.models import News
 from src.notifications.models import Notification
+from src.pagination import encode_cursor
 
 
 class NewsViewsTest(TestCase):
@@ -38,6 +45,24 @@ class NewsViewsTest(TestCase):
         assert response.status_code == 200
         assert self.third_notification in response.context["notification_list"]
 
+    def test_notification_list_query_count(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse("notifications:unread"))
+                [str(notification) for notification in response.context["notification_list"]]
+            return len(context.captured_queries)
+
+        first = count_queries()
+        news = News.objects.create(user=self.user, content="Liked news")
+
+        for _ in range(5):
+            Notification.objects.create(
+                actor=self.other_user, recipient=self.user, verb="W", action_object=news,
+            )
+
+        # Only the first news content type adds a query, not every row.
+        assert count_queries() == first + 1
+
     def test_mark_all_as_read(self):
         response = self.client.get(reverse("notifications:mark_all_read"), follow=True)
 
@@ -60,3 +85,54 @@ class NewsViewsTest(TestCase):
 
         assert response.status_code == 200
         assert self.third_notification in response.context["notifications"]
+
+    @mock.patch("src.notifications.counters.is_shared", return_value=True)
+    def test_unread_count(self, is_shared):
+        response = self.other_client.get(reverse("notifications:unread_count"))
+
+        assert response.status_code == 200
+        assert response.json() == {"unread": 2}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first_notification.mark_as_read()
+
+        with self.assertNumQueries(2):
+            response = self.other_client.get(reverse("notifications:unread_count"))
+
+        assert response.json() == {"unread": 1}
+
+    def test_unread_page(self):
+        for _ in range(45):
+            Notification.objects.create(actor=self.other_user, recipient=self.user, verb="L")
+
+        slugs = []
+        queries = []
+        cursor = None
+
+        while True:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse("notifications:unread_page"), {"cursor": cursor} if cursor else {},
+                )
+
+            assert response.status_code == 200
+            queries.append(context.captured_queries)
+            slugs += [notification["slug"] for notification in response.json()["notifications"]]
+            cursor = response.json()["next_cursor"]
+
+            if cursor is None:
+                break
+
+        assert len(slugs) == len(set(slugs)) == 46
+        assert len({len(page) for page in queries}) == 1
+        assert not any("OFFSET" in query["sql"] for page in queries for query in page)
+
+    def test_unread_page_bad_cursor(self):
+        response = self.client.get(reverse("notifications:unread_page"), {"cursor": "nope"})
+        assert response.status_code == 400
+
+    def test_unread_page_tampered_cursor(self):
+        response = self.client.get(
+            reverse("notifications:unread_page"), {"cursor": encode_cursor(timezone.now(), "not-a-pk")},
+        )
+        assert response.status_code == 400
@@ -1,10 +1,14 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import ListView
 
+from src.notifications.counters import get_unread_count
 from src.notifications.models import Notification
+from src.pagination import keyset_page
 
 
 class NotificationUnreadListView(LoginRequiredMixin, ListView):
@@ -13,12 +17,21 @@ class NotificationUnreadListView(LoginRequiredMixin, ListView):
     template_name = "notifications/notification_list.html"
 
     def get_queryset(self, **kwargs):
-        return self.request.user.notifications.unread()
+        notifications, self.next_cursor = keyset_page(
+            self.request.user.notifications.with_related().unread(),
+            size=settings.NOTIFICATIONS_PAGE_SIZE,
+        )
+        return notifications
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context["next_cursor"] = self.next_cursor
+        return context
 
 
 @login_required
 def mark_all_as_read(request):
-    request.user.notifications.mark_all_as_read()
+    Notification.objects.mark_all_as_read(request.user)
     request_next = request.GET.get("next")
     messages.add_message(
         request,
@@ -57,7 +70,37 @@ def mark_as_read(request, slug=None):
 
 @login_required
 def get_latest_notifications(request):
-    notifications = request.user.notifications.get_most_recent()
+    if get_unread_count(request.user):
+        notifications = request.user.notifications.with_related().get_most_recent()
+    else:
+        notifications = Notification.objects.none()
+
     return render(
         request, "notifications/most_recent.html", {"notifications": notifications}
     )
+
+
+@login_required
+def unread_count(request):
+    """Returns the number of unread notifications from the cache, without
+    touching the notifications table while the counter is warm."""
+    return JsonResponse({"unread": get_unread_count(request.user)})
+
+
+@login_required
+def unread_page(request):
+    """Infinite scroll endpoint returning the unread notifications that
+    follow the ``cursor`` query parameter."""
+    try:
+        notifications, next_cursor = keyset_page(
+            request.user.notifications.with_related().unread(),
+            cursor=request.GET.get("cursor"),
+            size=settings.NOTIFICATIONS_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    return JsonResponse({
+        "notifications": [notification.serialize() for notification in notifications],
+        "next_cursor": next_cursor,
+    })
@@ -0,0 +1,67 @@
+import base64
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(timestamp, pk):
+    """Encodes the position of a row in ``(timestamp, pk)`` order as an opaque
+    URL-safe string."""
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the ``(timestamp, pk)`` pair of a cursor. Raises ValueError
+    for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), pk
+    except (TypeError, UnicodeDecodeError, ValueError) as error:
+        raise ValueError(f"Invalid cursor {cursor!r}") from error
+
+
+def resolve_cursor(model, cursor, field="timestamp"):
+    """Returns the ``(field, pk)`` pair of a cursor converted by the fields of
+    ``model``. Raises ValueError when it does not hold valid values."""
+    timestamp, pk = decode_cursor(cursor)
+    opts = model._meta
+
+    try:
+        return opts.get_field(field).to_python(timestamp), opts.pk.to_python(pk)
+    except ValidationError as error:
+        raise ValueError(f"Invalid cursor {cursor!r}") from error
+
+
+def keyset_filter(queryset, cursor, descending=True, field="timestamp"):
+    """Filters ``queryset`` to the rows that come after ``cursor``. Raises
+    ValueError for cursors that do not fit the model of ``queryset``."""
+    timestamp, pk = resolve_cursor(queryset.model, cursor, field)
+    lookup = "lt" if descending else "gt"
+
+    return queryset.filter(
+        Q(**{f"{field}__{lookup}": timestamp}) | Q(**{field: timestamp, f"pk__{lookup}": pk})
+    )
+
+
+def keyset_page(queryset, cursor=None, size=20, descending=True, field="timestamp"):
+    """Returns a page of ``size`` rows following ``cursor`` and the cursor of
+    the next page, or None on the last page. Unlike OFFSET pagination the
+    cost does not grow with the page depth, as long as an index matches the
+    ``(field, pk)`` ordering."""
+
+    ordering = (f"-{field}", "-pk") if descending else (field, "pk")
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        queryset = keyset_filter(queryset, cursor, descending, field)
+
+    items = list(queryset[:size + 1])
+
+    if len(items) > size:
+        last = items[size - 1]
+        return items[:size], encode_cursor(getattr(last, field), last.pk)
+
+    return items, None
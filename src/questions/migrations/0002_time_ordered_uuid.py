@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import src.identifiers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='uuid_id',
+            field=models.UUIDField(default=src.identifiers.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='uuid_id',
+            field=models.UUIDField(default=src.identifiers.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from src.tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_after", "timestamp")
+    list_filter = ("name", "status")
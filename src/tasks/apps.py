@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'src.tasks'
+
+    def ready(self):
+        # Register the task functions declared in every app's ``tasks`` module.
+        autodiscover_modules("tasks")
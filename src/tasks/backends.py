@@ -0,0 +1,32 @@
+from django.utils import timezone
+
+from src.tasks.queue import run_task
+
+
+class BaseBackend:
+    def enqueue(self, name, payload, delay=None):
+        raise NotImplementedError
+
+
+class DatabaseBackend(BaseBackend):
+    """Stores every task as a row executed later by the ``run_worker``
+    management command. The row is written in the caller's transaction, so
+    a rolled back request never leaves work behind."""
+
+    def enqueue(self, name, payload, delay=None):
+        from src.tasks.models import Task
+
+        run_after = timezone.now()
+
+        if delay:
+            run_after += delay
+
+        return Task.objects.create(name=name, payload=payload, run_after=run_after)
+
+
+class InProcessBackend(BaseBackend):
+    """Runs every task immediately in the calling process, ignoring delays.
+    Meant for tests and local development without a worker."""
+
+    def enqueue(self, name, payload, delay=None):
+        run_task(name, payload)
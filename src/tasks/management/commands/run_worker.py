@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Executes queued deferred tasks, retrying the ones that fail."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.TASKS_BATCH_SIZE,
+            help="Number of tasks claimed per round.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=settings.TASKS_POLL_INTERVAL,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Process the due tasks and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--stats", action="store_true",
+            help="Print the queue depth and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for label, total in Task.objects.depth().items():
+                self.stdout.write(f"{label}: {total}")
+            return
+
+        while True:
+            done = self.process(options["batch_size"])
+
+            if options["once"] and not done:
+                break
+
+            if not done:
+                time.sleep(options["sleep"])
+
+    def process(self, batch_size):
+        Task.objects.release_stale()
+        tasks = Task.objects.claim(batch_size)
+
+        for task in tasks:
+            if task.execute():
+                self.stdout.write(f"Done {task.name}")
+            else:
+                self.stderr.write(f"Failed {task.name}: {task.last_error}")
+
+        return len(tasks)
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from src.tasks.queue import run_task
+
+
+class TaskQuerySet(models.query.QuerySet):
+    def pending(self):
+        return self.filter(status=Task.PENDING)
+
+    def running(self):
+        return self.filter(status=Task.RUNNING)
+
+    def failed(self):
+        return self.filter(status=Task.FAILED)
+
+    def due(self, now=None):
+        return self.pending().filter(run_after__lte=now or timezone.now())
+
+    def release_stale(self, timeout=None):
+        """Puts back tasks whose worker died while running them."""
+        timeout = timeout or settings.TASKS_LOCK_TIMEOUT
+        deadline = timezone.now() - timedelta(seconds=timeout)
+        return self.running().filter(locked_at__lt=deadline).update(
+            status=Task.PENDING, locked_at=None,
+        )
+
+    def claim(self, limit):
+        """Locks up to ``limit`` due tasks for the current worker. Rows locked
+        by another worker are skipped instead of waited for."""
+
+        with transaction.atomic():
+            ids = list(
+                self.due()
+                .order_by("run_after")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:limit]
+            )
+            self.filter(pk__in=ids).update(
+                status=Task.RUNNING,
+                locked_at=timezone.now(),
+                attempts=F("attempts") + 1,
+            )
+
+        return list(self.filter(pk__in=ids).order_by("run_after"))
+
+    def depth(self):
+        """Returns the number of queued tasks per status."""
+        counts = dict(self.values_list("status").annotate(total=Count("pk")).order_by())
+        return {label: counts.get(status, 0) for status, label in Task.STATUS}
+
+
+class Task(models.Model):
+    PENDING = "P"
+    RUNNING = "R"
+    FAILED = "F"
+    STATUS = ((PENDING, "pending"), (RUNNING, "running"), (FAILED, "failed"))
+
+    objects = TaskQuerySet.as_manager()
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=1, choices=STATUS, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Task"
+        verbose_name_plural = "Tasks"
+        ordering = ("run_after",)
+        indexes = [models.Index(fields=["status", "run_after"], name="tasks_status_run_after_idx")]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    def execute(self):
+        """Runs the task, deleting it on success and scheduling a retry with
+        exponential backoff on failure. Returns whether it succeeded."""
+
+        try:
+            run_task(self.name, self.payload)
+        except Exception as error:
+            self.fail(error)
+            return False
+
+        self.delete()
+        return True
+
+    def fail(self, error):
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.locked_at = None
+
+        if self.attempts >= self.max_attempts:
+            self.status = Task.FAILED
+        else:
+            self.status = Task.PENDING
+            backoff = settings.TASKS_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.run_after = timezone.now() + timedelta(seconds=backoff)
+
+        self.save()
@@ -0,0 +1,51 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+_registry = {}
+_backends = {}
+
+
+def task(name):
+    """Decorator to register a function as a deferred task under ``name``."""
+
+    def decorator(function):
+        _registry[name] = function
+        return function
+
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Task {name!r} is not registered.")
+
+
+def run_task(name, payload):
+    return get_task(name)(**payload)
+
+
+def serialize(payload):
+    """Round-trips the payload through JSON so every backend sees the same
+    data the database backend would store."""
+    return json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def get_backend():
+    path = settings.TASKS_BACKEND
+
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+
+    return _backends[path]
+
+
+def enqueue(name, delay=None, **payload):
+    """Schedules the task ``name`` with keyword arguments ``payload``.
+    ``delay`` is a timedelta to wait before the task may run."""
+    get_task(name)
+    return get_backend().enqueue(name, serialize(payload), delay=delay)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from test_plus.test import TestCase
+
+from src.tasks.models import Task
+from src.tasks.queue import enqueue, task
+
+calls = []
+
+
+@task("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task("tests.explode")
+def explode():
+    raise ValueError("boom")
+
+
+class TasksModelsTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+        backend = override_settings(TASKS_BACKEND="src.tasks.backends.DatabaseBackend")
+        backend.enable()
+        self.addCleanup(backend.disable)
+
+    def test_enqueue_stores_task(self):
+        enqueue("tests.record", value=1)
+
+        task_obj = Task.objects.get()
+        assert task_obj.name == "tests.record"
+        assert task_obj.payload == {"value": 1}
+        assert task_obj.status == Task.PENDING
+        assert calls == []
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(LookupError):
+            enqueue("tests.missing")
+
+    def test_worker_runs_and_deletes_tasks(self):
+        enqueue("tests.record", value=1)
+        enqueue("tests.record", value=2)
+
+        call_command("run_worker", once=True, stdout=StringIO())
+
+        assert calls == [1, 2]
+        assert not Task.objects.exists()
+
+    def test_delayed_task_is_not_due(self):
+        enqueue("tests.record", delay=timedelta(minutes=5), value=1)
+
+        call_command("run_worker", once=True, stdout=StringIO())
+
+        assert calls == []
+        assert Task.objects.pending().count() == 1
+
+    def test_failed_task_is_retried_then_given_up(self):
+        enqueue("tests.explode")
+
+        call_command("run_worker", once=True, stdout=StringIO(), stderr=StringIO())
+        task_obj = Task.objects.get()
+
+        assert task_obj.status == Task.PENDING
+        assert task_obj.attempts == 1
+        assert task_obj.run_after > timezone.now()
+        assert "boom" in task_obj.last_error
+
+        Task.objects.update(attempts=task_obj.max_attempts - 1, run_after=timezone.now())
+        call_command("run_worker", once=True, stdout=StringIO(), stderr=StringIO())
+
+        assert Task.objects.get().status == Task.FAILED
+
+    def test_stale_tasks_are_released(self):
+        enqueue("tests.record", value=1)
+        Task.objects.update(status=Task.RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+
+        assert Task.objects.release_stale() == 1
+        assert Task.objects.due().count() == 1
+
+    def test_queue_depth(self):
+        enqueue("tests.record", value=1)
+        enqueue("tests.record", value=2)
+        Task.objects.filter(payload__value=2).update(status=Task.FAILED)
+
+        out = StringIO()
+        call_command("run_worker", stats=True, stdout=out)
+
+        assert Task.objects.depth() == {"pending": 1, "running": 0, "failed": 1}
+        assert "pending: 1" in out.getvalue()
+
+
+class InProcessBackendTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(TASKS_BACKEND="src.tasks.backends.InProcessBackend")
+    def test_runs_immediately(self):
+        enqueue("tests.record", value=3)
+
+        assert calls == [3]
+        assert not Task.objects.exists()
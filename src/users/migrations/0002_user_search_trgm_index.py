@@ -0,0 +1,40 @@
+from django.db import migrations
+
+INDEXES = {
+    "users_user_username_trgm_idx": "UPPER(username)",
+    "users_user_name_trgm_idx": "UPPER(name)",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Case-insensitive lookups compile to UPPER(column) LIKE UPPER(pattern) on
+    # PostgreSQL, which these indexes serve for prefix and substring patterns.
+    # Other backends keep scanning the table.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for name, expression in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON users_user USING gin ({expression} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,165 @@
+"""Online presence tracked from open WebSocket connections.
+
+Every user has a connection counter in the cache, so several tabs count as
+one presence. Heartbeats are kept in a Redis sorted set scored with the time
+of the user's last heartbeat: a socket that died without disconnecting stops
+counting after ``PRESENCE_TIMEOUT`` seconds, and expired users are pruned by
+score instead of being scanned one by one. Nothing is written to the
+database.
+
+Sockets of one user may be held by different ASGI workers and presence is
+read by the web processes, so both live in the Redis cache configured in
+``CACHES``.
+"""
+
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+ONLINE_KEY = "presence:online"
+
+
+def presence_group(user_id):
+    """Channel group of the sockets watching the presence of one user."""
+    return f"presence-{user_id}"
+
+
+def _connections_key(user_id):
+    return f"presence:connections:{user_id}"
+
+
+def connect(user_id):
+    """Registers a new connection, returns whether the user just came online."""
+
+    key = _connections_key(user_id)
+    cache.add(key, 0, settings.PRESENCE_TIMEOUT)
+
+    try:
+        connections = cache.incr(key)
+    except ValueError:
+        # Expired between ``add`` and ``incr``.
+        cache.set(key, 1, settings.PRESENCE_TIMEOUT)
+        connections = 1
+
+    heartbeat(user_id)
+    return connections == 1
+
+
+def heartbeat(user_id):
+    get_redis_connection().zadd(ONLINE_KEY, {user_id: time.time()})
+    cache.touch(_connections_key(user_id), settings.PRESENCE_TIMEOUT)
+
+
+def disconnect(user_id):
+    """Unregisters a connection, returns whether the user went offline."""
+
+    try:
+        connections = cache.decr(_connections_key(user_id))
+    except ValueError:
+        connections = 0
+
+    if connections > 0:
+        return False
+
+    cache.delete(_connections_key(user_id))
+    get_redis_connection().zrem(ONLINE_KEY, user_id)
+    return True
+
+
+def is_online(user_id):
+    last_seen = get_redis_connection().zscore(ONLINE_KEY, user_id)
+    return last_seen is not None and last_seen > time.time() - settings.PRESENCE_TIMEOUT
+
+
+def online_user_ids():
+    """Ids of the users with a live heartbeat. Users whose heartbeat expired
+    are removed from the set on the way."""
+
+    deadline = time.time() - settings.PRESENCE_TIMEOUT
+    pipeline = get_redis_connection().pipeline()
+    pipeline.zremrangebyscore(ONLINE_KEY, "-inf", deadline)
+    pipeline.zrangebyscore(ONLINE_KEY, deadline, "+inf")
+    _, members = pipeline.execute()
+
+    to_pk = get_user_model()._meta.pk.to_python
+    return {to_pk(member.decode()) for member in members}
+
+
+class PresenceConsumerMixin:
+    """Tracks the presence of the connected user for a WebSocket consumer and
+    forwards presence changes of watched users to the client."""
+
+    async def presence_connect(self):
+        user = self.scope["user"]
+
+        if await sync_to_async(connect)(user.pk):
+            await self.broadcast_presence(True)
+
+    async def presence_disconnect(self):
+        user = self.scope["user"]
+
+        for group in getattr(self, "presence_groups", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+        if not user.is_anonymous and await sync_to_async(disconnect)(user.pk):
+            await self.broadcast_presence(False)
+
+    async def broadcast_presence(self, online):
+        user = self.scope["user"]
+        await self.channel_layer.group_send(
+            presence_group(user.pk),
+            {"type": "presence", "users": {user.username: online}},
+        )
+
+    async def presence_heartbeat(self):
+        await sync_to_async(heartbeat)(self.scope["user"].pk)
+
+    async def presence_watch(self, usernames):
+        """Subscribes to the presence changes of ``usernames`` and replies with
+        their current state."""
+
+        users = await sync_to_async(self.get_watched_users)(usernames)
+        self.presence_groups = getattr(self, "presence_groups", [])
+
+        for user_id, _, _ in users:
+            group = presence_group(user_id)
+
+            if group not in self.presence_groups:
+                self.presence_groups.append(group)
+                await self.channel_layer.group_add(group, self.channel_name)
+
+        await self.presence({
+            "type": "presence",
+            "users": {username: online for _, username, online in users},
+        })
+
+    async def receive_presence_frame(self, frame):
+        """Handles the presence frames sent by the client, returns whether
+        ``frame`` was one of them."""
+
+        if frame.get("type") == "heartbeat":
+            await self.presence_heartbeat()
+            return True
+
+        if frame.get("type") == "presence.watch" and isinstance(frame.get("users"), list):
+            await self.presence_watch([str(username) for username in frame["users"]])
+            return True
+
+        return False
+
+    @staticmethod
+    def get_watched_users(usernames):
+        users = (
+            get_user_model()
+            .objects.filter(username__in=usernames[:settings.PRESENCE_WATCH_LIMIT])
+            .values_list("pk", "username")
+        )
+        return [(user_id, username, is_online(user_id)) for user_id, username in users]
+
+    async def presence(self, event):
+        await self.send(text_data=json.dumps({"key": "presence", "users": event["users"]}))
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.urls import reverse
+from django_redis import get_redis_connection
+from test_plus.test import TestCase
+
+from src.users import presence
+
+
+class PresenceTest(TestCase):
+    def setUp(self):
+        self.user = self.make_user("first_user")
+        self.other_user = self.make_user("second_user")
+
+    def test_connections_are_counted(self):
+        assert presence.connect(self.user.pk)
+        assert not presence.connect(self.user.pk)
+        assert presence.online_user_ids() == {self.user.pk}
+
+        assert not presence.disconnect(self.user.pk)
+        assert presence.is_online(self.user.pk)
+
+        assert presence.disconnect(self.user.pk)
+        assert not presence.is_online(self.user.pk)
+        assert presence.online_user_ids() == set()
+
+    def test_missing_heartbeat_means_offline(self):
+        presence.connect(self.user.pk)
+        presence.connect(self.other_user.pk)
+        expired = time.time() - settings.PRESENCE_TIMEOUT - 1
+        get_redis_connection().zadd(presence.ONLINE_KEY, {self.user.pk: expired})
+
+        assert not presence.is_online(self.user.pk)
+        assert presence.online_user_ids() == {self.other_user.pk}
+        # The expired heartbeat was pruned from the set.
+        assert get_redis_connection().zcard(presence.ONLINE_KEY) == 1
+
+    def test_online_users_view(self):
+        presence.connect(self.other_user.pk)
+        self.client.login(username="first_user", password="password")
+
+        response = self.client.get(reverse("users:online"))
+
+        assert response.status_code == 200
+        assert response.json() == {"users": [{"username": "second_user", "name": ""}]}
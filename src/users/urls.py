@@ -8,6 +8,7 @@ urlpatterns = [
     re_path(r"^$", view=views.UserListView.as_view(), name="list"),
     re_path(r"^~redirect/$", view=views.UserRedirectView.as_view(), name="redirect"),
     re_path(r"^~update/$", view=views.UserUpdateView.as_view(), name="update"),
+    re_path(r"^~online/$", view=views.online_users, name="online"),
     re_path(
         r"^(?P<username>[\w.@+-]+)/$",
         view=views.UserDetailView.as_view(),
@@ -1,7 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from django.urls import reverse
 from django.views.generic import DetailView, ListView, RedirectView, UpdateView
 
+from . import presence
 from .models import User
 
 
@@ -49,3 +53,20 @@ class UserUpdateView(LoginRequiredMixin, UpdateView):
     def get_object(self, queryset=None):
         # Get only the User record for the User sending the request
         return User.objects.get(username=self.request.user.username)
+
+
+@login_required
+def online_users(request):
+    """Returns the users with an open WebSocket connection, read from the
+    presence set in Redis."""
+    user_ids = presence.online_user_ids()
+    users = []
+
+    if user_ids:
+        users = list(
+            User.objects.filter(pk__in=user_ids)
+            .order_by("username")
+            .values("username", "name")[:settings.PRESENCE_LIST_LIMIT]
+        )
+
+    return JsonResponse({"users": users})